@@ -1,5 +1,7 @@
 import argparse
+import functools
 import os
+import re
 import sys
 from pathlib import Path
 from typing import Optional
@@ -13,6 +15,36 @@ except ImportError:
     )
     sys.exit(1)
 
+# Fast path for the duration forms shown in --help (PT30S, PT5M, PT1H, P1D);
+# anything else falls through to isodate
+_SIMPLE_DURATION_PATTERN = re.compile(r"PT(\d+)([HMS])|P(\d+)([DW])")
+_DURATION_UNIT_SECONDS = {"S": 1, "M": 60, "H": 3600, "D": 86400, "W": 604800}
+
+
+@functools.lru_cache(maxsize=32)
+def parse_iso8601_duration_seconds(duration_str: str) -> float:
+    """
+    Parse an ISO 8601 duration into a number of seconds.
+
+    Results are cached, so validating a duration and then using it parses it
+    only once.
+
+    Args:
+        duration_str: The duration string to parse (e.g., 'PT5M', 'PT1H')
+
+    Returns:
+        Duration length in seconds
+
+    Raises:
+        isodate.ISO8601Error: If the string is not a valid ISO 8601 duration
+    """
+    match = _SIMPLE_DURATION_PATTERN.fullmatch(duration_str)
+    if match:
+        amount, unit = match.group(1, 2) if match.group(1) else match.group(3, 4)
+        return float(int(amount) * _DURATION_UNIT_SECONDS[unit])
+
+    return isodate.parse_duration(duration_str).total_seconds()
+
 
 def validate_iso8601_duration(duration_str: str) -> Optional[str]:
     """
@@ -29,8 +61,7 @@ def validate_iso8601_duration(duration_str: str) -> Optional[str]:
         return f"Duration must be positive (negative durations not allowed): {duration_str}"
 
     try:
-        duration = isodate.parse_duration(duration_str)
-        if duration.total_seconds() <= 0:
+        if parse_iso8601_duration_seconds(duration_str) <= 0:
             return f"Duration must be positive, got: {duration_str}"
         return None
     except isodate.ISO8601Error as e:
@@ -109,6 +140,14 @@ https://en.wikipedia.org/wiki/ISO_8601#Durations
         help="Output format (default: %(default)s). 'grouped' provides human-readable sections, 'csv' provides machine-readable data",
     )
 
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of worker processes used to parse the log file (default: %(default)s)",
+    )
+
     parser.add_argument(
         "log_file_path",
         metavar="LOG_FILE_PATH",
@@ -130,6 +169,12 @@ def main() -> None:
         print("\nUse --help to see valid duration format examples.", file=sys.stderr)
         sys.exit(1)
 
+    if args.workers < 1:
+        print(
+            f"Error: --workers must be at least 1, got: {args.workers}", file=sys.stderr
+        )
+        sys.exit(1)
+
     # Validate log file path
     file_error = validate_log_file_path(args.log_file_path)
     if file_error:
@@ -138,8 +183,7 @@ def main() -> None:
 
     # Parse the duration for internal use
     try:
-        parsed_duration = isodate.parse_duration(args.period)
-        duration_seconds = parsed_duration.total_seconds()
+        duration_seconds = parse_iso8601_duration_seconds(args.period)
     except Exception as e:
         print(f"Error: Failed to parse duration: {e}", file=sys.stderr)
         sys.exit(1)
@@ -155,9 +199,16 @@ def main() -> None:
         aggregator = TimeAggregator(duration_seconds)
         formatter = OutputFormatterFactory.create_formatter(args.format)
 
-        # Parse log entries
-        print("Parsing log file...", file=sys.stderr)
-        log_entries = list(parser.parse_log_file(args.log_file_path))
+        # Parse log entries and stream them straight into the aggregator
+        print("Parsing and aggregating log file...", file=sys.stderr)
+        if args.workers > 1:
+            aggregated_buckets = aggregator.aggregate_log_file_parallel(
+                parser, args.log_file_path, workers=args.workers
+            )
+        else:
+            aggregated_buckets = aggregator.aggregate_metrics(
+                parser.parse_log_file(args.log_file_path)
+            )
 
         # Get parsing statistics
         stats = parser.get_parsing_stats()
@@ -166,23 +217,28 @@ def main() -> None:
             file=sys.stderr,
         )
 
-        if not log_entries:
+        if not stats["parsed_entries"]:
             print(
                 "No valid log entries found with upstream timing data.", file=sys.stderr
             )
             sys.exit(1)
 
-        # Aggregate metrics
-        print("Aggregating metrics...", file=sys.stderr)
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
-
         if not aggregated_buckets:
             print("No upstream timing data found after aggregation.", file=sys.stderr)
             sys.exit(1)
 
-        # Format and output results
-        output = formatter.format_results(aggregated_buckets)
-        print(output)
+        # Format and stream results to stdout chunk by chunk, as bytes when
+        # stdout has a binary buffer
+        output = getattr(sys.stdout, "buffer", None)
+        if output is not None:
+            for chunk in formatter.format_results_iter(aggregated_buckets):
+                output.write(chunk)
+            output.write(b"\n")
+        else:
+            # Text-only streams, e.g. stdout redirected to an io.StringIO
+            for chunk in formatter.format_results_iter(aggregated_buckets):
+                sys.stdout.write(chunk.decode("utf-8"))
+            sys.stdout.write("\n")
 
     except ImportError as e:
         print(
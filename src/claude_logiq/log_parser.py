@@ -5,15 +5,32 @@ This module provides functionality to parse NGINX Plus JSON log files and extrac
 upstream timing data for analysis.
 """
 
-import json
 import logging
+import math
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Iterator, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# orjson is an optional speedup: it decodes straight from bytes in C and is
+# several times faster than the stdlib parser on NGINX Plus status lines.
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 logger = logging.getLogger(__name__)
 
+# Smallest byte range worth handing to a separate worker process
+PARALLEL_MIN_RANGE_SIZE = 1 << 20  # 1 MiB
+
+# Maximum number of distinct server names shared between parsed entries
+SERVER_NAME_CACHE_SIZE = 4096
+
 
-@dataclass
+@dataclass(slots=True)
 class UpstreamMetrics:
     """Represents timing metrics for a single upstream server."""
 
@@ -25,7 +42,7 @@ class UpstreamMetrics:
     response_time: Optional[int] = None  # milliseconds
 
 
-@dataclass
+@dataclass(slots=True)
 class LogEntry:
     """Represents a parsed log entry with timestamp and upstream metrics."""
 
@@ -40,11 +57,16 @@ class LogParser:
         self.parsed_entries = 0
         self.skipped_entries = 0
         self.error_entries = 0
+        # Server names repeat on every line; the decoder returns a new string
+        # each time, so share one instance per distinct value (up to a limit)
+        self._server_names: Dict[str, str] = {}
 
     def parse_log_file(self, file_path: str) -> Iterator[LogEntry]:
         """
         Parse a log file and yield LogEntry objects.
 
+        Parsing statistics are updated once the iterator is exhausted or closed.
+
         Args:
             file_path: Path to the NGINX Plus JSON log file
 
@@ -55,49 +77,237 @@ class LogParser:
             FileNotFoundError: If the log file doesn't exist
             IOError: If there are issues reading the file
         """
+        return self.parse_byte_range(file_path)
+
+    def parse_log_file_parallel(
+        self, file_path: str, workers: Optional[int] = None
+    ) -> List[LogEntry]:
+        """
+        Parse a log file using a pool of worker processes.
+
+        The file is split into byte ranges aligned to line boundaries, each range
+        is parsed in a separate process and the results are concatenated in file
+        order. Parsing statistics of all workers are added to this parser.
+
+        Args:
+            file_path: Path to the NGINX Plus JSON log file
+            workers: Number of worker processes (default: number of CPUs)
+
+        Returns:
+            List of parsed log entries, in the same order as parse_log_file
+
+        Raises:
+            FileNotFoundError: If the log file doesn't exist
+            IOError: If there are issues reading the file
+        """
+        entries: List[LogEntry] = []
+        for range_entries in self.map_byte_ranges(
+            file_path, _parse_byte_range_worker, workers=workers
+        ):
+            entries.extend(range_entries)
+        return entries
+
+    def map_byte_ranges(
+        self,
+        file_path: str,
+        worker: Callable[..., Tuple[Any, Dict[str, int]]],
+        *args: Any,
+        workers: Optional[int] = None,
+    ) -> List[Any]:
+        """
+        Run a function over line-aligned byte ranges of a log file in parallel.
+
+        Each range is handed to `worker(file_path, start, end, *args)` in a
+        separate process. The worker must be a module-level function returning
+        a tuple of its result and the parsing statistics of its range; the
+        statistics are added to this parser.
+
+        Args:
+            file_path: Path to the NGINX Plus JSON log file
+            worker: Function processing one byte range
+            *args: Extra arguments passed to every worker call
+            workers: Number of worker processes (default: number of CPUs)
+
+        Returns:
+            The worker results, in file order
+
+        Raises:
+            FileNotFoundError: If the log file doesn't exist
+            IOError: If there are issues reading the file
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                for line_num, line in enumerate(file, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    try:
-                        entry = self._parse_log_line(line)
-                        if entry:
-                            self.parsed_entries += 1
-                            yield entry
-                        else:
-                            self.skipped_entries += 1
-                    except Exception as e:
-                        self.error_entries += 1
-                        logger.warning(
-                            f"Error parsing line {line_num} in {file_path}: {e}"
-                        )
-                        continue
+            ranges = self._split_byte_ranges(file_path, workers)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Log file not found: {file_path}")
+        except IOError as e:
+            raise IOError(f"Error reading log file {file_path}: {e}")
+
+        if len(ranges) <= 1:
+            # Not worth a process pool; run the single range in this process
+            outputs = [worker(file_path, start, end, *args) for start, end in ranges]
+        else:
+            # Forked workers inherit the imported modules instead of
+            # re-importing them
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = multiprocessing.get_context()
+
+            with ProcessPoolExecutor(max_workers=len(ranges), mp_context=context) as executor:
+                outputs = list(executor.map(
+                    worker,
+                    [file_path] * len(ranges),
+                    [start for start, _ in ranges],
+                    [end for _, end in ranges],
+                    *[[arg] * len(ranges) for arg in args],
+                ))
+
+        results = []
+        for result, stats in outputs:
+            results.append(result)
+            self.parsed_entries += stats['parsed_entries']
+            self.skipped_entries += stats['skipped_entries']
+            self.error_entries += stats['error_entries']
+        return results
+
+    def parse_byte_range(
+        self, file_path: str, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[LogEntry]:
+        """
+        Parse the lines of a log file between two byte offsets.
+
+        Byte-range workers passed to map_byte_ranges use this to parse their
+        range. Parsing statistics are updated once the iterator is exhausted
+        or closed.
+
+        Args:
+            file_path: Path to the NGINX Plus JSON log file
+            start: Offset of the first byte to parse; must be at a line start
+            end: Offset just past the last byte to parse (default: end of file)
+
+        Yields:
+            LogEntry: Parsed log entries with upstream timing data
+
+        Raises:
+            FileNotFoundError: If the log file doesn't exist
+            IOError: If there are issues reading the file
+        """
+        try:
+            with open(file_path, 'rb') as file:
+                # Read through the buffered file rather than an mmap: a log
+                # truncated while it is parsed (logrotate copytruncate) then
+                # just ends early, where touching unmapped pages would SIGBUS
+                file.seek(start)
+                # Decode and extract directly rather than through
+                # _parse_log_line, saving a call per line
+                loads = _json_loads
+                parse_obj = self._parse_log_obj
+                pos = start
+                # Count in locals and add to the instance totals once the
+                # range is done, or the caller stops iterating early
+                parsed = skipped = errors = 0
+                try:
+                    for line_num, line in enumerate(file, 1):
+                        if end is not None and pos >= end:
+                            break
+                        pos += len(line)
+
+                        if line.isspace():
+                            continue
+
+                        try:
+                            entry = parse_obj(loads(line))
+                            if entry:
+                                parsed += 1
+                                yield entry
+                            else:
+                                skipped += 1
+                        except Exception as e:
+                            errors += 1
+                            location = f"line {line_num}"
+                            if start:
+                                location += f" after byte offset {start}"
+                            logger.warning(
+                                f"Error parsing {location} in {file_path}: {e}"
+                            )
+                            continue
+                finally:
+                    self.parsed_entries += parsed
+                    self.skipped_entries += skipped
+                    self.error_entries += errors
 
         except FileNotFoundError:
             raise FileNotFoundError(f"Log file not found: {file_path}")
         except IOError as e:
             raise IOError(f"Error reading log file {file_path}: {e}")
 
-    def _parse_log_line(self, line: str) -> Optional[LogEntry]:
+    def _split_byte_ranges(self, file_path: str, workers: int) -> List[Tuple[int, int]]:
+        """
+        Split a file into at most `workers` byte ranges starting at line boundaries.
+
+        Args:
+            file_path: Path to the log file
+            workers: Maximum number of ranges to produce
+
+        Returns:
+            List of (start, end) byte offsets covering the whole file
+        """
+        file_size = os.path.getsize(file_path)
+        workers = max(1, min(workers, file_size // PARALLEL_MIN_RANGE_SIZE))
+        step = file_size // workers
+
+        boundaries = [0]
+        with open(file_path, 'rb') as file:
+            for i in range(1, workers):
+                file.seek(max(i * step, boundaries[-1]))
+                file.readline()  # Advance to the start of the next line
+                offset = file.tell()
+                if offset >= file_size:
+                    break
+                if offset > boundaries[-1]:
+                    boundaries.append(offset)
+        boundaries.append(file_size)
+
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def _parse_log_line(self, line: Union[str, bytes]) -> Optional[LogEntry]:
         """
         Parse a single log line and extract upstream timing data.
 
         Args:
-            line: JSON log line as string
+            line: JSON log line as string or raw UTF-8 bytes
 
         Returns:
             LogEntry if the line contains valid upstream data, None otherwise
 
         Raises:
             json.JSONDecodeError: If the line is not valid JSON
+            TypeError: If the line is not a JSON object or its stream.upstreams
+                path is malformed
         """
-        try:
-            log_data = json.loads(line)
-        except json.JSONDecodeError as e:
-            raise json.JSONDecodeError(f"Invalid JSON: {e}", line, e.pos)
+        # Decoder errors propagate unchanged; orjson.JSONDecodeError is a
+        # subclass of json.JSONDecodeError
+        return self._parse_log_obj(_json_loads(line))
+
+    def _parse_log_obj(self, log_data: object) -> Optional[LogEntry]:
+        """
+        Extract upstream timing data from an already decoded log record.
+
+        Args:
+            log_data: Decoded JSON value of one log line
+
+        Returns:
+            LogEntry if the record contains valid upstream data, None otherwise
+
+        Raises:
+            TypeError: If the record or its stream.upstreams path is not made
+                of JSON objects
+        """
+        if type(log_data) is not dict:
+            raise TypeError(f"Expected a JSON object, got {type(log_data).__name__}")
 
         # Extract timestamp
         timestamp = log_data.get('timestamp')
@@ -105,33 +315,69 @@ class LogParser:
             logger.debug("Skipping entry: missing or invalid timestamp")
             return None
 
-        # Extract upstream metrics from stream.upstreams
+        # Extract upstream metrics from stream.upstreams. Only this one path of
+        # the status document is needed, so index straight into it; a missing
+        # level means the line has no upstream data, while a level of the wrong
+        # type is malformed and raises
+        try:
+            upstreams_data = log_data['stream']['upstreams']
+        except KeyError:
+            return None
+        if type(upstreams_data) is not dict:
+            raise TypeError(
+                f"Expected stream.upstreams to be a JSON object, got {type(upstreams_data).__name__}"
+            )
+        if not upstreams_data:
+            return None
+
         upstream_metrics = []
-        stream_data = log_data.get('stream', {})
-        upstreams_data = stream_data.get('upstreams', {})
+        server_names = self._server_names
 
         for pool_name, pool_data in upstreams_data.items():
-            if not isinstance(pool_data, dict):
+            # The decoders only produce plain dicts and lists, so exact type
+            # checks are enough
+            if type(pool_data) is not dict:
                 continue
 
-            peers = pool_data.get('peers', [])
-            if not isinstance(peers, list):
+            peers = pool_data.get('peers')
+            if type(peers) is not list or not peers:
                 continue
 
+            # Pool names are few, fixed configuration keys; interning them makes
+            # every dict lookup keyed on them an identity hit
+            pool_name = sys.intern(pool_name)
+
             for peer in peers:
-                if not isinstance(peer, dict):
+                if type(peer) is not dict:
                     continue
 
                 # Extract server identifier
                 server = peer.get('server', 'unknown')
-
-                # Extract timing metrics
-                connect_time = self._extract_timing_metric(peer, 'connect_time')
-                first_byte_time = self._extract_timing_metric(peer, 'first_byte_time')
-                response_time = self._extract_timing_metric(peer, 'response_time')
+                if type(server) is str:
+                    cached = server_names.get(server)
+                    if cached is not None:
+                        server = cached
+                    elif len(server_names) < SERVER_NAME_CACHE_SIZE:
+                        server_names[server] = server
+
+                # Extract timing metrics; non-negative ints are by far the most
+                # common values and are accepted inline without a function call
+                connect_time = peer.get('connect_time')
+                if type(connect_time) is not int or connect_time < 0:
+                    connect_time = _coerce_timing_value(connect_time)
+                first_byte_time = peer.get('first_byte_time')
+                if type(first_byte_time) is not int or first_byte_time < 0:
+                    first_byte_time = _coerce_timing_value(first_byte_time)
+                response_time = peer.get('response_time')
+                if type(response_time) is not int or response_time < 0:
+                    response_time = _coerce_timing_value(response_time)
 
                 # Only create metrics entry if at least one timing value is present
-                if any(t is not None for t in [connect_time, first_byte_time, response_time]):
+                if not (
+                    connect_time is None
+                    and first_byte_time is None
+                    and response_time is None
+                ):
                     upstream_metrics.append(
                         UpstreamMetrics(
                             pool_name=pool_name,
@@ -161,17 +407,9 @@ class LogParser:
             Timing value in milliseconds, or None if not available/invalid
         """
         value = peer_data.get(metric_name)
-
-        if value is None:
-            return None
-
-        # Handle different data types
-        if isinstance(value, (int, float)):
-            # Convert to int (milliseconds)
-            return int(value) if value >= 0 else None
-
-        # Skip invalid data types
-        return None
+        if type(value) is int and value >= 0:
+            return value
+        return _coerce_timing_value(value)
 
     def get_parsing_stats(self) -> Dict[str, int]:
         """
@@ -191,4 +429,57 @@ class LogParser:
         """Reset parsing statistics counters."""
         self.parsed_entries = 0
         self.skipped_entries = 0
-        self.error_entries = 0
\ No newline at end of file
+        self.error_entries = 0
+
+
+def _coerce_timing_value(value: object) -> Optional[int]:
+    """
+    Convert a raw timing value that is not a non-negative int to milliseconds.
+
+    Args:
+        value: Timing value as decoded from JSON
+
+    Returns:
+        Timing value in milliseconds, or None if negative or not a number
+    """
+    # Exact type checks: bool is an int subclass but never a valid timing
+    if type(value) is float and value >= 0:
+        return _round_half_up_ms(value)
+    return None
+
+
+def _round_half_up_ms(value: float) -> int:
+    """
+    Round a non-negative number of milliseconds to the nearest integer, ties up.
+
+    Unlike int(value + 0.5), the addition cannot itself round: the fraction
+    value - floor(value) is exact for every float, so values just below .5
+    and integers beyond 2**52 are rounded correctly without Decimal.
+
+    Args:
+        value: Non-negative timing value in milliseconds
+
+    Returns:
+        Rounded timing value in milliseconds
+    """
+    whole = math.floor(value)
+    return whole + (value - whole >= 0.5)
+
+
+def _parse_byte_range_worker(
+    file_path: str, start: int, end: int
+) -> Tuple[List[LogEntry], Dict[str, int]]:
+    """
+    Parse one byte range of a log file in a worker process.
+
+    Args:
+        file_path: Path to the NGINX Plus JSON log file
+        start: Offset of the first byte to parse
+        end: Offset just past the last byte to parse
+
+    Returns:
+        Tuple of the parsed log entries and the parsing statistics of the range
+    """
+    parser = LogParser()
+    entries = list(parser.parse_byte_range(file_path, start, end))
+    return entries, parser.get_parsing_stats()
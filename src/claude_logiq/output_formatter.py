@@ -5,18 +5,28 @@ This module provides different output formats for the analyzed timing data,
 including human-readable grouped format and machine-readable CSV format.
 """
 
-import csv
+import functools
 from abc import ABC, abstractmethod
-from io import StringIO
-from typing import List
+from typing import Any, Dict, Iterator, List
 
 from .time_aggregator import AggregatedBucket, TimingStats
 
+CSV_HEADER = [
+    'pool_name', 'bucket_start', 'bucket_end', 'metric_type',
+    'min_ms', 'max_ms', 'avg_ms', 'p5_ms', 'p95_ms', 'count'
+]
+
+# Section titles of the metric types in the grouped report
+METRIC_LABELS = {
+    "connect_time": "Connect Time",
+    "first_byte_time": "First Byte Time",
+    "response_time": "Response Time",
+}
+
 
 class OutputFormatter(ABC):
     """Abstract base class for output formatters."""
 
-    @abstractmethod
     def format_results(self, buckets: List[AggregatedBucket]) -> str:
         """
         Format the aggregated results for output.
@@ -27,28 +37,56 @@ class OutputFormatter(ABC):
         Returns:
             Formatted output string
         """
+        return "".join(self._iter_chunks(buckets))
+
+    def format_results_iter(self, buckets: List[AggregatedBucket]) -> Iterator[bytes]:
+        """
+        Format the aggregated results as a stream of UTF-8 encoded chunks.
+
+        The chunks concatenate to the same text as format_results, but the full
+        output never has to be held in memory at once.
+
+        Args:
+            buckets: List of aggregated buckets to format
+
+        Yields:
+            Consecutive pieces of the formatted output
+        """
+        for chunk in self._iter_chunks(buckets):
+            yield chunk.encode('utf-8')
+
+    @abstractmethod
+    def _iter_chunks(self, buckets: List[AggregatedBucket]) -> Iterator[str]:
+        """
+        Generate the formatted output piece by piece.
+
+        Args:
+            buckets: List of aggregated buckets to format
+
+        Yields:
+            Consecutive pieces of the formatted output
+        """
         pass
 
 
 class GroupedFormatter(OutputFormatter):
     """Formatter for human-readable grouped output."""
 
-    def format_results(self, buckets: List[AggregatedBucket]) -> str:
+    def _iter_chunks(self, buckets: List[AggregatedBucket]) -> Iterator[str]:
         """
-        Format results in a human-readable grouped format.
+        Generate results in a human-readable grouped format.
 
         Args:
             buckets: List of aggregated buckets to format
 
-        Returns:
-            Formatted output string with grouped sections
+        Yields:
+            The report header, then one chunk per pool header and time bucket
         """
         if not buckets:
-            return "No upstream timing data found in the log file.\n"
+            yield "No upstream timing data found in the log file.\n"
+            return
 
-        output = StringIO()
-        output.write("NGINX Plus Upstream Timing Analysis\n")
-        output.write("=" * 50 + "\n\n")
+        yield "NGINX Plus Upstream Timing Analysis\n" + "=" * 50 + "\n\n"
 
         # Group buckets by pool name
         pools = {}
@@ -59,49 +97,89 @@ class GroupedFormatter(OutputFormatter):
 
         # Format each pool
         for pool_name, pool_buckets in pools.items():
-            output.write(f"Upstream Pool: {pool_name}\n")
-            output.write("-" * 30 + "\n")
+            yield f"Upstream Pool: {pool_name}\n" + "-" * 30 + "\n"
 
             for bucket in pool_buckets:
-                output.write(f"Time Bucket: {bucket.bucket_start_iso} - {bucket.bucket_end_iso}\n")
+                rendered = self._bucket_struct(bucket)
+                bucket_start_iso, bucket_end_iso = rendered["bucket"]
+                parts = [f"Time Bucket: {bucket_start_iso} - {bucket_end_iso}\n"]
 
                 # Format timing statistics
-                if bucket.connect_time_stats:
-                    output.write("  Connect Time:\n")
-                    output.write(self._format_timing_stats(bucket.connect_time_stats, indent="    "))
+                for metric_type, stats in rendered["metrics"].items():
+                    parts.append(f"  {METRIC_LABELS[metric_type]}:\n")
+                    parts.append(self._format_timing_stats(stats, indent="    "))
 
-                if bucket.first_byte_time_stats:
-                    output.write("  First Byte Time:\n")
-                    output.write(self._format_timing_stats(bucket.first_byte_time_stats, indent="    "))
+                parts.append("\n")
+                yield "".join(parts)
 
-                if bucket.response_time_stats:
-                    output.write("  Response Time:\n")
-                    output.write(self._format_timing_stats(bucket.response_time_stats, indent="    "))
+            yield "\n"
 
-                output.write("\n")
+    def render_struct(self, buckets: List[AggregatedBucket]) -> List[Dict[str, Any]]:
+        """
+        Describe the grouped report as plain data instead of text.
 
-            output.write("\n")
+        The text report is rendered from this same data.
 
-        return output.getvalue()
+        Args:
+            buckets: List of aggregated buckets to format
 
-    def _format_timing_stats(self, stats: TimingStats, indent: str = "") -> str:
+        Returns:
+            One dictionary per bucket, in the given order, with the pool name,
+            the ISO 8601 bucket bounds and the statistics of each metric type
+            that has data, keyed by metric type
+        """
+        return [self._bucket_struct(bucket) for bucket in buckets]
+
+    def _bucket_struct(self, bucket: AggregatedBucket) -> Dict[str, Any]:
+        """
+        Describe a single bucket as plain data.
+
+        Args:
+            bucket: Aggregated bucket to describe
+
+        Returns:
+            Dictionary with the pool name, the ISO 8601 bucket bounds and the
+            statistics of each metric type that has data, in display order
+        """
+        metrics = {}
+        for metric_type, stats in (
+            ("connect_time", bucket.connect_time_stats),
+            ("first_byte_time", bucket.first_byte_time_stats),
+            ("response_time", bucket.response_time_stats),
+        ):
+            if stats:
+                metrics[metric_type] = {
+                    "min": stats.min_value,
+                    "max": stats.max_value,
+                    "avg": stats.avg_value,
+                    "p5": stats.p5_value,
+                    "p95": stats.p95_value,
+                    "count": stats.count,
+                }
+        return {
+            "pool": bucket.pool_name,
+            "bucket": (bucket.bucket_start_iso, bucket.bucket_end_iso),
+            "metrics": metrics,
+        }
+
+    def _format_timing_stats(self, stats: Dict[str, Any], indent: str = "") -> str:
         """
         Format timing statistics for display.
 
         Args:
-            stats: TimingStats object to format
+            stats: Statistics of one metric type, as described by _bucket_struct
             indent: Indentation string for each line
 
         Returns:
             Formatted statistics string
         """
         lines = [
-            f"{indent}Min: {stats.min_value}ms\n",
-            f"{indent}Max: {stats.max_value}ms\n",
-            f"{indent}Avg: {stats.avg_value:.2f}ms\n",
-            f"{indent}P5:  {stats.p5_value:.2f}ms\n",
-            f"{indent}P95: {stats.p95_value:.2f}ms\n",
-            f"{indent}Count: {stats.count} samples\n"
+            f"{indent}Min: {stats['min']}ms\n",
+            f"{indent}Max: {stats['max']}ms\n",
+            f"{indent}Avg: {stats['avg']:.2f}ms\n",
+            f"{indent}P5:  {stats['p5']:.2f}ms\n",
+            f"{indent}P95: {stats['p95']:.2f}ms\n",
+            f"{indent}Count: {stats['count']} samples\n"
         ]
         return "".join(lines)
 
@@ -109,53 +187,74 @@ class GroupedFormatter(OutputFormatter):
 class CSVFormatter(OutputFormatter):
     """Formatter for machine-readable CSV output."""
 
-    def format_results(self, buckets: List[AggregatedBucket]) -> str:
+    def iter_rows(self, buckets: List[AggregatedBucket]) -> Iterator[str]:
         """
-        Format results in CSV format.
+        Generate the CSV output one row at a time.
+
+        The rows, line terminators included, concatenate to the output of
+        format_results.
 
         Args:
             buckets: List of aggregated buckets to format
 
-        Returns:
-            CSV formatted output string
+        Yields:
+            The header row, then one row per bucket and metric type
         """
+        header = ",".join(CSV_HEADER)
         if not buckets:
-            return "pool_name,bucket_start,bucket_end,metric_type,min_ms,max_ms,avg_ms,p5_ms,p95_ms,count\n"
+            # An empty result has always ended its header in a bare newline
+            yield header + "\n"
+            return
 
-        output = StringIO()
-        writer = csv.writer(output)
+        yield header + "\r\n"
+        for bucket in buckets:
+            yield from self._bucket_rows(bucket)
 
-        # Write header
-        header = [
-            'pool_name', 'bucket_start', 'bucket_end', 'metric_type',
-            'min_ms', 'max_ms', 'avg_ms', 'p5_ms', 'p95_ms', 'count'
-        ]
-        writer.writerow(header)
+    def _iter_chunks(self, buckets: List[AggregatedBucket]) -> Iterator[str]:
+        """
+        Generate results in CSV format.
 
-        # Write data rows
-        for bucket in buckets:
-            base_row = [
-                bucket.pool_name,
-                bucket.bucket_start_iso,
-                bucket.bucket_end_iso
-            ]
+        Args:
+            buckets: List of aggregated buckets to format
+
+        Returns:
+            Iterator over the rows produced by iter_rows
+        """
+        return self.iter_rows(buckets)
 
-            # Add rows for each metric type that has data
-            if bucket.connect_time_stats:
-                row = base_row + self._format_stats_for_csv(bucket.connect_time_stats, "connect_time")
-                writer.writerow(row)
+    def _bucket_rows(self, bucket: AggregatedBucket) -> List[str]:
+        """
+        Format the CSV rows of a single bucket.
+
+        Rows are assembled directly instead of through csv.writer: only the
+        pool name can need quoting, every other field is a timestamp or number.
+        Lines end in CRLF, the same terminator as csv.writer's default dialect.
+
+        Args:
+            bucket: Aggregated bucket to format
+
+        Returns:
+            One row per metric type that has data
+        """
+        row_prefix = (
+            f"{_quote_csv_field(bucket.pool_name)},"
+            f"{bucket.bucket_start_iso},{bucket.bucket_end_iso},"
+        )
+
+        # Add rows for each metric type that has data
+        rows = []
+        if bucket.connect_time_stats:
+            rows.append(row_prefix + self._format_stats_for_csv(bucket.connect_time_stats, "connect_time") + "\r\n")
 
-            if bucket.first_byte_time_stats:
-                row = base_row + self._format_stats_for_csv(bucket.first_byte_time_stats, "first_byte_time")
-                writer.writerow(row)
+        if bucket.first_byte_time_stats:
+            rows.append(row_prefix + self._format_stats_for_csv(bucket.first_byte_time_stats, "first_byte_time") + "\r\n")
 
-            if bucket.response_time_stats:
-                row = base_row + self._format_stats_for_csv(bucket.response_time_stats, "response_time")
-                writer.writerow(row)
+        if bucket.response_time_stats:
+            rows.append(row_prefix + self._format_stats_for_csv(bucket.response_time_stats, "response_time") + "\r\n")
 
-        return output.getvalue()
+        return rows
 
-    def _format_stats_for_csv(self, stats: TimingStats, metric_type: str) -> List:
+    def _format_stats_for_csv(self, stats: TimingStats, metric_type: str) -> str:
         """
         Format timing statistics for CSV output.
 
@@ -164,32 +263,48 @@ class CSVFormatter(OutputFormatter):
             metric_type: Type of metric (connect_time, first_byte_time, response_time)
 
         Returns:
-            List of formatted values for CSV row
-        """
-        return [
-            metric_type,
-            stats.min_value,
-            stats.max_value,
-            round(stats.avg_value, 2),
-            round(stats.p5_value, 2),
-            round(stats.p95_value, 2),
-            stats.count
-        ]
+            Comma-separated metric fields of a CSV row
+        """
+        return (
+            f"{metric_type},{stats.min_value},{stats.max_value},"
+            f"{round(stats.avg_value, 2)},{round(stats.p5_value, 2)},"
+            f"{round(stats.p95_value, 2)},{stats.count}"
+        )
+
+
+def _quote_csv_field(value: str) -> str:
+    """
+    Quote a CSV field the way csv.writer does with QUOTE_MINIMAL.
+
+    Args:
+        value: Field value
+
+    Returns:
+        The value, wrapped in quotes with inner quotes doubled if it contains
+        a delimiter, quote or line break
+    """
+    if any(char in value for char in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
 
 
 class OutputFormatterFactory:
     """Factory class for creating output formatters."""
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def create_formatter(format_type: str) -> OutputFormatter:
         """
         Create an output formatter of the specified type.
 
+        Formatters hold no state, so one instance per type is created and
+        returned by every later call.
+
         Args:
             format_type: Type of formatter ('grouped' or 'csv')
 
         Returns:
-            OutputFormatter instance
+            Shared OutputFormatter instance
 
         Raises:
             ValueError: If format_type is not supported
@@ -5,16 +5,23 @@ This module provides functionality to group upstream timing data by time buckets
 and calculate statistical metrics for analysis.
 """
 
-import statistics
-from collections import defaultdict
+import functools
+from collections import Counter
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from .log_parser import LogEntry, UpstreamMetrics
+from .log_parser import LogEntry, LogParser
 
+# Histogram of timing values: value in milliseconds -> number of samples
+ValueCounts = Dict[int, int]
 
-@dataclass
+# Grouped histograms: pool name -> bucket start -> (connect_times,
+# first_byte_times, response_times) value counts
+BucketData = Dict[str, Dict[int, Tuple[ValueCounts, ValueCounts, ValueCounts]]]
+
+
+@dataclass(slots=True)
 class TimingStats:
     """Statistical metrics for timing data."""
 
@@ -27,7 +34,7 @@ class TimingStats:
     metric_name: str
 
 
-@dataclass
+@dataclass(slots=True)
 class AggregatedBucket:
     """Represents aggregated metrics for a time bucket and upstream pool."""
 
@@ -41,12 +48,29 @@ class AggregatedBucket:
     @property
     def bucket_start_iso(self) -> str:
         """Get bucket start time as ISO 8601 string."""
-        return datetime.fromtimestamp(self.bucket_start / 1000).isoformat()
+        return _format_iso(self.bucket_start)
 
     @property
     def bucket_end_iso(self) -> str:
         """Get bucket end time as ISO 8601 string."""
-        return datetime.fromtimestamp(self.bucket_end / 1000).isoformat()
+        return _format_iso(self.bucket_end)
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_iso(timestamp_ms: int) -> str:
+    """
+    Format a Unix millisecond timestamp as a local ISO 8601 string.
+
+    Bucket bounds repeat across pools, and each bucket ends where the next one
+    starts, so every distinct timestamp is formatted only once.
+
+    Args:
+        timestamp_ms: Timestamp in milliseconds
+
+    Returns:
+        ISO 8601 representation of the timestamp in local time
+    """
+    return datetime.fromtimestamp(timestamp_ms / 1000).isoformat()
 
 
 class TimeAggregator:
@@ -63,55 +87,162 @@ class TimeAggregator:
         if self.bucket_duration_ms <= 0:
             raise ValueError("Bucket duration must be positive")
 
-    def aggregate_metrics(self, log_entries: List[LogEntry]) -> List[AggregatedBucket]:
+    def aggregate_metrics(
+        self, log_entries: Iterable[LogEntry]
+    ) -> List[AggregatedBucket]:
         """
         Aggregate log entries into time buckets and calculate statistics.
 
+        Entries are consumed in a single pass, so a generator such as
+        LogParser.parse_log_file can be passed directly without first
+        collecting every entry into a list.
+
         Args:
-            log_entries: List of parsed log entries
+            log_entries: Iterable of parsed log entries
 
         Returns:
             List of aggregated buckets with statistical metrics
         """
-        if not log_entries:
-            return []
+        # Group metric values by pool and time bucket
+        return self._create_buckets(self._group_by_buckets(log_entries))
+
+    def aggregate_log_file_parallel(
+        self, parser: LogParser, file_path: str, workers: Optional[int] = None
+    ) -> List[AggregatedBucket]:
+        """
+        Parse and aggregate a log file using a pool of worker processes.
 
-        # Group metrics by pool and time bucket
-        bucket_data = self._group_by_buckets(log_entries)
+        Each worker parses one byte range of the file and groups it into value
+        histograms itself, so only the compact histograms are sent back, never
+        the parsed entries. Histograms merge exactly, so the result is the same
+        as aggregating parser.parse_log_file(file_path).
 
-        # Calculate statistics for each bucket
-        aggregated_buckets = []
-        for (pool_name, bucket_start), metrics_list in bucket_data.items():
-            bucket = self._create_aggregated_bucket(
-                pool_name, bucket_start, metrics_list
-            )
-            if bucket:
-                aggregated_buckets.append(bucket)
+        Args:
+            parser: Parser whose statistics receive the counts of all workers
+            file_path: Path to the NGINX Plus JSON log file
+            workers: Number of worker processes (default: number of CPUs)
+
+        Returns:
+            List of aggregated buckets with statistical metrics
+
+        Raises:
+            FileNotFoundError: If the log file doesn't exist
+            IOError: If there are issues reading the file
+        """
+        bucket_data: BucketData = {}
+        for range_data in parser.map_byte_ranges(
+            file_path, _group_byte_range_worker, self, workers=workers
+        ):
+            self._merge_bucket_data(bucket_data, range_data)
+        return self._create_buckets(bucket_data)
+
+    def _create_buckets(self, bucket_data: BucketData) -> List[AggregatedBucket]:
+        """
+        Calculate the statistics of grouped metric values.
 
-        # Sort by pool name, then by bucket start time
-        aggregated_buckets.sort(key=lambda b: (b.pool_name, b.bucket_start))
+        Args:
+            bucket_data: Value counts as returned by _group_by_buckets
+
+        Returns:
+            List of aggregated buckets sorted by pool name and bucket start
+        """
+        # Visit pools by name and each pool's buckets by start time so the
+        # result comes out already sorted
+        aggregated_buckets = []
+        for pool_name in sorted(bucket_data):
+            pool_buckets = bucket_data[pool_name]
+            for bucket_start in sorted(pool_buckets):
+                bucket = self._create_aggregated_bucket(
+                    pool_name, bucket_start, *pool_buckets[bucket_start]
+                )
+                if bucket:
+                    aggregated_buckets.append(bucket)
 
         return aggregated_buckets
 
-    def _group_by_buckets(
-        self, log_entries: List[LogEntry]
-    ) -> Dict[Tuple[str, int], List[UpstreamMetrics]]:
+    def _merge_bucket_data(
+        self,
+        target: BucketData,
+        source: BucketData,
+    ) -> None:
+        """
+        Add the value counts of one grouping into another.
+
+        Args:
+            target: Grouped value counts to update in place
+            source: Grouped value counts to add; may share structure with target
+                afterwards and must not be reused
+        """
+        for pool_name, pool_buckets in source.items():
+            target_buckets = target.get(pool_name)
+            if target_buckets is None:
+                target[pool_name] = pool_buckets
+                continue
+
+            for bucket_start, columns in pool_buckets.items():
+                target_columns = target_buckets.get(bucket_start)
+                if target_columns is None:
+                    target_buckets[bucket_start] = columns
+                    continue
+
+                for target_counts, counts in zip(target_columns, columns):
+                    for value, n in counts.items():
+                        target_counts[value] = target_counts.get(value, 0) + n
+
+    def _group_by_buckets(self, log_entries: Iterable[LogEntry]) -> BucketData:
         """
-        Group upstream metrics by pool name and time bucket.
+        Group upstream timing values by pool name and time bucket.
+
+        Values are stored column-wise as histograms: each bucket holds one
+        value -> occurrence count mapping per metric type. Timings are whole
+        milliseconds, so the number of distinct values stays small no matter how
+        many samples fall into a bucket, while percentiles remain exact.
 
         Args:
-            log_entries: List of parsed log entries
+            log_entries: Iterable of parsed log entries
 
         Returns:
-            Dictionary mapping (pool_name, bucket_start) to list of metrics
+            Nested dictionary mapping pool_name -> bucket_start to a tuple of
+            (connect_times, first_byte_times, response_times) value counts
         """
-        bucket_data = defaultdict(list)
+        bucket_data: BucketData = {}
+        duration_ms = self.bucket_duration_ms
+
+        # All peers of a log line share the pool and timestamp of their
+        # neighbours, so the bucket lookup is only repeated when either changes
+        last_pool_name = last_timestamp = None
+        connect_counts = first_byte_counts = response_counts = None
 
         for entry in log_entries:
             for metric in entry.upstream_metrics:
-                bucket_start = self._get_bucket_start(metric.timestamp)
-                key = (metric.pool_name, bucket_start)
-                bucket_data[key].append(metric)
+                pool_name = metric.pool_name
+                timestamp = metric.timestamp
+                if pool_name is not last_pool_name or timestamp != last_timestamp:
+                    # Nested lookups avoid building and hashing a (pool, bucket)
+                    # tuple for every metric
+                    pool_buckets = bucket_data.get(pool_name)
+                    if pool_buckets is None:
+                        pool_buckets = bucket_data[pool_name] = {}
+
+                    # Same arithmetic as _get_bucket_start, inlined
+                    bucket_start = timestamp // duration_ms * duration_ms
+                    columns = pool_buckets.get(bucket_start)
+                    if columns is None:
+                        columns = pool_buckets[bucket_start] = ({}, {}, {})
+
+                    connect_counts, first_byte_counts, response_counts = columns
+                    last_pool_name = pool_name
+                    last_timestamp = timestamp
+
+                value = metric.connect_time
+                if value is not None:
+                    connect_counts[value] = connect_counts.get(value, 0) + 1
+                value = metric.first_byte_time
+                if value is not None:
+                    first_byte_counts[value] = first_byte_counts.get(value, 0) + 1
+                value = metric.response_time
+                if value is not None:
+                    response_counts[value] = response_counts.get(value, 0) + 1
 
         return bucket_data
 
@@ -128,7 +259,12 @@ class TimeAggregator:
         return (timestamp_ms // self.bucket_duration_ms) * self.bucket_duration_ms
 
     def _create_aggregated_bucket(
-        self, pool_name: str, bucket_start: int, metrics_list: List[UpstreamMetrics]
+        self,
+        pool_name: str,
+        bucket_start: int,
+        connect_times: ValueCounts,
+        first_byte_times: ValueCounts,
+        response_times: ValueCounts,
     ) -> Optional[AggregatedBucket]:
         """
         Create an aggregated bucket with statistical metrics.
@@ -136,39 +272,28 @@ class TimeAggregator:
         Args:
             pool_name: Name of the upstream pool
             bucket_start: Bucket start timestamp in milliseconds
-            metrics_list: List of upstream metrics in this bucket
+            connect_times: Connect time value counts in this bucket
+            first_byte_times: First byte time value counts in this bucket
+            response_times: Response time value counts in this bucket
 
         Returns:
             AggregatedBucket with calculated statistics, or None if no valid metrics
         """
         bucket_end = bucket_start + self.bucket_duration_ms
 
-        # Collect timing values by metric type
-        connect_times = []
-        first_byte_times = []
-        response_times = []
-
-        for metric in metrics_list:
-            if metric.connect_time is not None:
-                connect_times.append(metric.connect_time)
-            if metric.first_byte_time is not None:
-                first_byte_times.append(metric.first_byte_time)
-            if metric.response_time is not None:
-                response_times.append(metric.response_time)
-
         # Calculate statistics for each metric type
         connect_stats = (
-            self._calculate_timing_stats(connect_times, "connect_time")
+            self._calculate_counted_stats(connect_times, "connect_time")
             if connect_times
             else None
         )
         first_byte_stats = (
-            self._calculate_timing_stats(first_byte_times, "first_byte_time")
+            self._calculate_counted_stats(first_byte_times, "first_byte_time")
             if first_byte_times
             else None
         )
         response_stats = (
-            self._calculate_timing_stats(response_times, "response_time")
+            self._calculate_counted_stats(response_times, "response_time")
             if response_times
             else None
         )
@@ -202,29 +327,55 @@ class TimeAggregator:
         Returns:
             TimingStats with calculated statistics
         """
-        if not values:
+        return self._calculate_counted_stats(Counter(values), metric_name)
+
+    def _calculate_counted_stats(
+        self, value_counts: ValueCounts, metric_name: str
+    ) -> TimingStats:
+        """
+        Calculate statistical metrics from a histogram of timing values.
+
+        Args:
+            value_counts: Mapping of timing value in milliseconds to its count
+            metric_name: Name of the metric being calculated
+
+        Returns:
+            TimingStats with calculated statistics
+        """
+        if not value_counts:
             raise ValueError("Cannot calculate statistics for empty list")
 
-        sorted_values = sorted(values)
-        count = len(sorted_values)
+        distinct_values = sorted(value_counts)
+        count = sum(value_counts.values())
 
         # Basic statistics
-        min_value = min(sorted_values)
-        max_value = max(sorted_values)
-        avg_value = statistics.mean(sorted_values)
+        min_value = distinct_values[0]
+        max_value = distinct_values[-1]
+        # Like statistics.mean, keep an integral mean of ints as an int so the
+        # output prints "1" rather than "1.0"
+        total = sum(value * n for value, n in value_counts.items())
+        avg_value = total // count if total % count == 0 else total / count
 
         # Calculate percentiles using simpler index-based approach
         if count == 1:
-            p5_value = p95_value = float(sorted_values[0])
+            p5_index = p95_index = 0
         elif count == 2:
-            p5_value = float(sorted_values[0])
-            p95_value = float(sorted_values[1])
+            p5_index, p95_index = 0, 1
         else:
             # Use index-based percentile calculation to stay within data bounds
             p5_index = max(0, int(0.05 * (count - 1)))
             p95_index = min(count - 1, int(0.95 * (count - 1)))
-            p5_value = float(sorted_values[p5_index])
-            p95_value = float(sorted_values[p95_index])
+
+        # Walk the cumulative counts to find the values at both indexes
+        p5_value = p95_value = None
+        seen = 0
+        for value in distinct_values:
+            seen += value_counts[value]
+            if p5_value is None and p5_index < seen:
+                p5_value = float(value)
+            if p95_index < seen:
+                p95_value = float(value)
+                break
 
         return TimingStats(
             min_value=min_value,
@@ -243,3 +394,25 @@ class TimeAggregator:
     def get_bucket_duration_seconds(self) -> float:
         """Get the bucket duration in seconds."""
         return self.bucket_duration_ms / 1000.0
+
+
+def _group_byte_range_worker(
+    file_path: str, start: int, end: int, aggregator: TimeAggregator
+) -> Tuple[BucketData, Dict[str, int]]:
+    """
+    Parse and group one byte range of a log file in a worker process.
+
+    Args:
+        file_path: Path to the NGINX Plus JSON log file
+        start: Offset of the first byte to parse
+        end: Offset just past the last byte to parse
+        aggregator: Aggregator defining the bucket duration
+
+    Returns:
+        Tuple of the grouped value counts and the parsing statistics of the range
+    """
+    parser = LogParser()
+    bucket_data = aggregator._group_by_buckets(
+        parser.parse_byte_range(file_path, start, end)
+    )
+    return bucket_data, parser.get_parsing_stats()
@@ -0,0 +1,26 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import pytest
+
+from claude_logiq.output_formatter import CSVFormatter, GroupedFormatter
+from claude_logiq.time_aggregator import TimeAggregator
+
+
+@pytest.fixture(scope="session")
+def grouped_formatter():
+    """Grouped formatter shared by all tests; formatters hold no state."""
+    return GroupedFormatter()
+
+
+@pytest.fixture(scope="session")
+def csv_formatter():
+    """CSV formatter shared by all tests; formatters hold no state."""
+    return CSVFormatter()
+
+
+@pytest.fixture(scope="session")
+def aggregator():
+    """Five-minute aggregator shared by all tests; it keeps no state between calls."""
+    return TimeAggregator(bucket_duration_seconds=300)
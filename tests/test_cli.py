@@ -0,0 +1,166 @@
+"""
+Tests for the command line interface helpers.
+"""
+
+import contextlib
+import io
+import json
+import sys
+
+import isodate
+import pytest
+
+from claude_logiq import (
+    log_parser,
+    main,
+    parse_iso8601_duration_seconds,
+    validate_iso8601_duration,
+)
+from claude_logiq.log_parser import LogParser
+from claude_logiq.output_formatter import OutputFormatterFactory
+from claude_logiq.time_aggregator import TimeAggregator
+
+
+@pytest.fixture(scope="module")
+def log_file(tmp_path_factory):
+    """Log file with two pools spread over several five-minute buckets."""
+    log_data = [
+        json.dumps(
+            {
+                "timestamp": 1446249499322 + i * 30000,
+                "stream": {
+                    "upstreams": {
+                        f"pool_{i % 2}": {
+                            "peers": [
+                                {
+                                    "server": "10.0.0.1:80",
+                                    "connect_time": i % 3,
+                                    "first_byte_time": i % 5,
+                                    "response_time": i,
+                                }
+                            ]
+                        }
+                    }
+                },
+            }
+        )
+        for i in range(60)
+    ]
+    log_file = tmp_path_factory.mktemp("logs") / "test.log"
+    log_file.write_bytes("\n".join(log_data).encode())
+    return str(log_file)
+
+
+def _expected_output(log_file, format_type):
+    """Format a log file through the library pipeline, as main should print it."""
+    buckets = TimeAggregator(300).aggregate_metrics(
+        LogParser().parse_log_file(log_file)
+    )
+    return (
+        OutputFormatterFactory.create_formatter(format_type).format_results(buckets)
+        + "\n"
+    )
+
+
+class TestDurationParsing:
+    """Test cases for ISO 8601 duration parsing and validation."""
+
+    @pytest.mark.parametrize(
+        "duration_str", ["PT30S", "PT1M", "PT5M", "PT90M", "PT1H", "PT2H", "P1D", "P1W"]
+    )
+    def test_fast_path_matches_isodate(self, duration_str):
+        """Test that the fast path agrees with isodate for simple durations."""
+        expected = isodate.parse_duration(duration_str).total_seconds()
+        assert parse_iso8601_duration_seconds(duration_str) == expected
+
+    @pytest.mark.parametrize("duration_str", ["PT1H30M", "PT0.5S", "P1DT2H"])
+    def test_compound_durations_use_isodate(self, duration_str):
+        """Test that durations outside the fast path are still parsed."""
+        expected = isodate.parse_duration(duration_str).total_seconds()
+        assert parse_iso8601_duration_seconds(duration_str) == expected
+
+    def test_invalid_duration_raises(self):
+        """Test that invalid durations raise an ISO 8601 error."""
+        with pytest.raises(isodate.ISO8601Error):
+            parse_iso8601_duration_seconds("5 minutes")
+
+    def test_validate_valid_duration(self):
+        """Test validating a valid duration."""
+        assert validate_iso8601_duration("PT5M") is None
+
+    def test_validate_zero_duration(self):
+        """Test that zero durations are rejected."""
+        assert "must be positive" in validate_iso8601_duration("PT0M")
+
+    def test_validate_negative_duration(self):
+        """Test that negative durations are rejected."""
+        assert "negative durations not allowed" in validate_iso8601_duration("-PT5M")
+
+    def test_validate_invalid_duration(self):
+        """Test that malformed durations produce a format error."""
+        assert "Invalid ISO 8601 duration format" in validate_iso8601_duration("5M")
+
+
+class TestMain:
+    """Test cases for the main CLI entry point."""
+
+    @pytest.mark.parametrize("format_type", ["grouped", "csv"])
+    def test_main_with_text_only_stdout(self, monkeypatch, log_file, format_type):
+        """Test that main prints the report to a stdout without a binary buffer."""
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["claude-logiq", "--period", "PT5M", "--format", format_type, log_file],
+        )
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            main()
+
+        assert output.getvalue() == _expected_output(log_file, format_type)
+
+    def test_main_rejects_zero_workers(self, monkeypatch, capsys, log_file):
+        """Test that --workers 0 exits with an error before parsing."""
+        monkeypatch.setattr(
+            sys,
+            "argv",
+            ["claude-logiq", "--period", "PT5M", "--workers", "0", log_file],
+        )
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        captured = capsys.readouterr()
+        assert exc_info.value.code == 1
+        assert "Error: --workers must be at least 1, got: 0" in captured.err
+        assert captured.out == ""
+
+    @pytest.mark.parametrize("format_type", ["grouped", "csv"])
+    def test_main_parallel_workers_match_single_worker(
+        self, monkeypatch, capsys, log_file, format_type
+    ):
+        """Test that --workers 2 prints the same report as --workers 1."""
+        monkeypatch.setattr(log_parser, "PARALLEL_MIN_RANGE_SIZE", 64)
+        outputs = []
+        for workers in ("1", "2"):
+            monkeypatch.setattr(
+                sys,
+                "argv",
+                [
+                    "claude-logiq",
+                    "--period",
+                    "PT5M",
+                    "--format",
+                    format_type,
+                    "--workers",
+                    workers,
+                    log_file,
+                ],
+            )
+            main()
+            outputs.append(capsys.readouterr())
+
+        assert (
+            outputs[1].out == outputs[0].out == _expected_output(log_file, format_type)
+        )
+        assert outputs[1].err == outputs[0].err
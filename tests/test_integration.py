@@ -3,82 +3,87 @@ Integration tests for the complete log processing pipeline.
 """
 
 import json
+
+import pytest
+from claude_logiq import log_parser
 from claude_logiq.log_parser import LogParser
 from claude_logiq.time_aggregator import TimeAggregator
 from claude_logiq.output_formatter import OutputFormatterFactory
 
 
-class TestLogProcessingIntegration:
-    """Integration tests for the complete log processing pipeline."""
-
-    def test_complete_pipeline_grouped_format(self, tmp_path):
-        """Test the complete pipeline from parsing to grouped output."""
-        # Create test log data similar to actual NGINX Plus logs
-        log_data = [
-            json.dumps({
-                "timestamp": 1446249499322,
-                "stream": {
-                    "upstreams": {
-                        "postgresql_backends": {
-                            "peers": [
-                                {
-                                    "server": "10.0.0.2:15432",
-                                    "connect_time": 1,
-                                    "first_byte_time": 2,
-                                    "response_time": 2
-                                },
-                                {
-                                    "server": "10.0.0.2:15433",
-                                    "connect_time": 1,
-                                    "first_byte_time": 5,
-                                    "response_time": 5
-                                }
-                            ]
-                        }
+@pytest.fixture(scope="module")
+def postgresql_log_file(tmp_path_factory):
+    """Two-line NGINX Plus log shared by the tests that only read it."""
+    # Create test log data similar to actual NGINX Plus logs
+    log_data = [
+        json.dumps({
+            "timestamp": 1446249499322,
+            "stream": {
+                "upstreams": {
+                    "postgresql_backends": {
+                        "peers": [
+                            {
+                                "server": "10.0.0.2:15432",
+                                "connect_time": 1,
+                                "first_byte_time": 2,
+                                "response_time": 2
+                            },
+                            {
+                                "server": "10.0.0.2:15433",
+                                "connect_time": 1,
+                                "first_byte_time": 5,
+                                "response_time": 5
+                            }
+                        ]
                     }
                 }
-            }),
-            json.dumps({
-                "timestamp": 1446249504427,
-                "stream": {
-                    "upstreams": {
-                        "postgresql_backends": {
-                            "peers": [
-                                {
-                                    "server": "10.0.0.2:15432",
-                                    "connect_time": 1,
-                                    "first_byte_time": 2,
-                                    "response_time": 2
-                                },
-                                {
-                                    "server": "10.0.0.2:15434",
-                                    "connect_time": 1,
-                                    "first_byte_time": 21,
-                                    "response_time": 21
-                                }
-                            ]
-                        }
+            }
+        }),
+        json.dumps({
+            "timestamp": 1446249504427,
+            "stream": {
+                "upstreams": {
+                    "postgresql_backends": {
+                        "peers": [
+                            {
+                                "server": "10.0.0.2:15432",
+                                "connect_time": 1,
+                                "first_byte_time": 2,
+                                "response_time": 2
+                            },
+                            {
+                                "server": "10.0.0.2:15434",
+                                "connect_time": 1,
+                                "first_byte_time": 21,
+                                "response_time": 21
+                            }
+                        ]
                     }
                 }
-            })
-        ]
+            }
+        })
+    ]
 
-        # Write test log file
-        log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+    log_file = tmp_path_factory.mktemp("logs") / "postgresql.log"
+    log_file.write_bytes("\n".join(log_data).encode())
+    return str(log_file)
 
+
+class TestLogProcessingIntegration:
+    """Integration tests for the complete log processing pipeline."""
+
+    def test_complete_pipeline_grouped_format(self, aggregator, postgresql_log_file):
+        """Test the complete pipeline from parsing to grouped output."""
         # Initialize components
         parser = LogParser()
-        aggregator = TimeAggregator(bucket_duration_seconds=300)  # 5 minutes
         formatter = OutputFormatterFactory.create_formatter("grouped")
 
         # Execute pipeline
-        log_entries = list(parser.parse_log_file(str(log_file)))
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
+        aggregated_buckets = aggregator.aggregate_metrics(parser.parse_log_file(postgresql_log_file))
         output = formatter.format_results(aggregated_buckets)
 
         # Validate results
-        assert len(log_entries) == 2
+        assert parser.get_parsing_stats()["parsed_entries"] == 2
         assert len(aggregated_buckets) == 1  # Same time bucket
 
         bucket = aggregated_buckets[0]
@@ -97,6 +102,71 @@ class TestLogProcessingIntegration:
         assert "First Byte Time:" in output
         assert "Response Time:" in output
 
+    @pytest.mark.parametrize(
+        "bucket_duration_seconds,expected_buckets", [(5, 2), (300, 1), (3600, 1)]
+    )
+    def test_pipeline_bucket_durations(
+        self, postgresql_log_file, bucket_duration_seconds, expected_buckets
+    ):
+        """Test that the same log splits into buckets according to duration."""
+        parser = LogParser()
+        aggregator = TimeAggregator(bucket_duration_seconds=bucket_duration_seconds)
+
+        aggregated_buckets = aggregator.aggregate_metrics(
+            parser.parse_log_file(postgresql_log_file)
+        )
+
+        assert len(aggregated_buckets) == expected_buckets
+        assert sum(
+            bucket.connect_time_stats.count for bucket in aggregated_buckets
+        ) == 4
+
+    def test_parallel_aggregation_matches_sequential(self, tmp_path, monkeypatch):
+        """Test that aggregating byte ranges in workers gives the same buckets."""
+        monkeypatch.setattr(log_parser, "PARALLEL_MIN_RANGE_SIZE", 64)
+
+        # Entries 5 s apart put each pool's minute buckets across several
+        # byte ranges, so the worker histograms have to be merged
+        log_data = []
+        for i in range(40):
+            log_data.append(json.dumps({
+                "timestamp": 1446249499322 + i * 5000,
+                "stream": {
+                    "upstreams": {
+                        f"pool_{i % 3}": {
+                            "peers": [
+                                {
+                                    "server": "backend:5432",
+                                    "connect_time": i % 2,
+                                    "first_byte_time": i % 11,
+                                    "response_time": i,
+                                }
+                            ]
+                        }
+                    }
+                }
+            }))
+            if i % 9 == 0:
+                log_data.append("invalid json line")
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes("\n".join(log_data).encode())
+
+        sequential_parser = LogParser()
+        expected = TimeAggregator(60).aggregate_metrics(
+            sequential_parser.parse_log_file(str(log_file))
+        )
+
+        parser = LogParser()
+        buckets = TimeAggregator(60).aggregate_log_file_parallel(
+            parser, str(log_file), workers=4
+        )
+
+        assert len(expected) > 3
+        assert buckets == expected
+        assert parser.get_parsing_stats() == sequential_parser.get_parsing_stats()
+        assert parser.get_parsing_stats()["parsed_entries"] == 40
+
     def test_complete_pipeline_csv_format(self, tmp_path):
         """Test the complete pipeline with CSV output format."""
         # Create simpler test data
@@ -121,7 +191,7 @@ class TestLogProcessingIntegration:
 
         # Write test log file
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         # Initialize components
         parser = LogParser()
@@ -129,8 +199,7 @@ class TestLogProcessingIntegration:
         formatter = OutputFormatterFactory.create_formatter("csv")
 
         # Execute pipeline
-        log_entries = list(parser.parse_log_file(str(log_file)))
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
+        aggregated_buckets = aggregator.aggregate_metrics(parser.parse_log_file(str(log_file)))
         output = formatter.format_results(aggregated_buckets)
 
         # Validate CSV output
@@ -148,7 +217,7 @@ class TestLogProcessingIntegration:
         assert "connect_time" in csv_content
         assert "response_time" in csv_content
 
-    def test_pipeline_with_multiple_pools_and_buckets(self, tmp_path):
+    def test_pipeline_with_multiple_pools_and_buckets(self, aggregator, tmp_path):
         """Test pipeline with multiple pools and time buckets."""
         # Create test data spanning multiple time buckets and pools
         log_data = [
@@ -176,16 +245,14 @@ class TestLogProcessingIntegration:
 
         # Write test log file
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         # Initialize components
         parser = LogParser()
-        aggregator = TimeAggregator(bucket_duration_seconds=300)  # 5 minutes
         formatter = OutputFormatterFactory.create_formatter("grouped")
 
         # Execute pipeline
-        log_entries = list(parser.parse_log_file(str(log_file)))
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
+        aggregated_buckets = aggregator.aggregate_metrics(parser.parse_log_file(str(log_file)))
         output = formatter.format_results(aggregated_buckets)
 
         # Should have 2 buckets (different pools in different time buckets)
@@ -195,7 +262,7 @@ class TestLogProcessingIntegration:
         assert "pool_a" in output
         assert "pool_b" in output
 
-    def test_pipeline_with_parsing_errors(self, tmp_path):
+    def test_pipeline_with_parsing_errors(self, aggregator, tmp_path):
         """Test pipeline handling of parsing errors and partial data."""
         log_data = [
             # Valid entry
@@ -238,16 +305,14 @@ class TestLogProcessingIntegration:
 
         # Write test log file
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         # Initialize components
         parser = LogParser()
-        aggregator = TimeAggregator(bucket_duration_seconds=300)
         formatter = OutputFormatterFactory.create_formatter("grouped")
 
         # Execute pipeline
-        log_entries = list(parser.parse_log_file(str(log_file)))
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
+        aggregated_buckets = aggregator.aggregate_metrics(parser.parse_log_file(str(log_file)))
         output = formatter.format_results(aggregated_buckets)
 
         # Should have successfully processed 2 valid entries
@@ -260,7 +325,7 @@ class TestLogProcessingIntegration:
         assert len(aggregated_buckets) >= 1
         assert "valid_pool" in output
 
-    def test_pipeline_empty_results(self, tmp_path):
+    def test_pipeline_empty_results(self, aggregator, tmp_path):
         """Test pipeline behavior with no valid upstream data."""
         log_data = [
             # Entry without upstream data
@@ -277,19 +342,17 @@ class TestLogProcessingIntegration:
 
         # Write test log file
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         # Initialize components
         parser = LogParser()
-        aggregator = TimeAggregator(bucket_duration_seconds=300)
         formatter = OutputFormatterFactory.create_formatter("grouped")
 
         # Execute pipeline
-        log_entries = list(parser.parse_log_file(str(log_file)))
-        aggregated_buckets = aggregator.aggregate_metrics(log_entries)
+        aggregated_buckets = aggregator.aggregate_metrics(parser.parse_log_file(str(log_file)))
         output = formatter.format_results(aggregated_buckets)
 
         # Should have no valid entries with upstream data
-        assert len(log_entries) == 0
+        assert parser.get_parsing_stats()["parsed_entries"] == 0
         assert len(aggregated_buckets) == 0
         assert "No upstream timing data found" in output
\ No newline at end of file
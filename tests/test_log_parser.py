@@ -3,11 +3,33 @@ Tests for the log parser module.
 """
 
 import json
+import os
+
 import pytest
 
+from claude_logiq import log_parser
 from claude_logiq.log_parser import LogParser
 
 
+def _entry(timestamp=1446249499322, pool_name="test_pool", **peer):
+    """Build a log record with a single upstream peer."""
+    return {
+        "timestamp": timestamp,
+        "stream": {"upstreams": {pool_name: {"peers": [peer]}}},
+    }
+
+
+@pytest.fixture(params=["orjson", "json"])
+def json_backend(request, monkeypatch):
+    """Run the test against both the orjson fast path and the stdlib fallback."""
+    if request.param == "orjson":
+        loads = pytest.importorskip("orjson").loads
+    else:
+        loads = json.loads
+    monkeypatch.setattr(log_parser, "_json_loads", loads)
+    return request.param
+
+
 class TestLogParser:
     """Test cases for LogParser class."""
 
@@ -15,6 +37,7 @@ class TestLogParser:
         """Set up test fixtures."""
         self.parser = LogParser()
 
+    @pytest.mark.usefixtures("json_backend")
     def test_parse_valid_log_line(self):
         """Test parsing a valid log line with upstream data."""
         log_line = json.dumps({
@@ -63,6 +86,38 @@ class TestLogParser:
         assert metric2.first_byte_time == 5
         assert metric2.response_time == 5
 
+    @pytest.mark.usefixtures("json_backend")
+    def test_parse_log_line_bytes(self):
+        """Test parsing a raw bytes line as read from the log file."""
+        log_line = json.dumps(_entry(server="test:8080", response_time=7)).encode("utf-8")
+
+        entry = self.parser._parse_log_line(log_line)
+
+        assert entry is not None
+        assert entry.upstream_metrics[0].response_time == 7
+
+    def test_parsed_records_use_slots(self):
+        """Test that parsed records carry no per-instance __dict__."""
+        log_line = json.dumps(_entry(server="test:8080", response_time=7))
+
+        entry = self.parser._parse_log_line(log_line)
+
+        assert not hasattr(entry, "__dict__")
+        assert not hasattr(entry.upstream_metrics[0], "__dict__")
+
+    @pytest.mark.usefixtures("json_backend")
+    def test_parse_log_line_invalid_json_bytes(self):
+        """Test that invalid bytes lines raise the stdlib JSONDecodeError type."""
+        with pytest.raises(json.JSONDecodeError):
+            self.parser._parse_log_line(b"invalid json {")
+
+    @pytest.mark.usefixtures("json_backend")
+    def test_parse_log_obj_matches_parse_log_line(self):
+        """Test that decoded records are parsed like the JSON line they came from."""
+        record = _entry(server="test:8080", connect_time=1, response_time=4)
+
+        assert self.parser._parse_log_obj(record) == self.parser._parse_log_line(json.dumps(record))
+
     def test_parse_log_line_missing_timestamp(self):
         """Test parsing a log line without timestamp."""
         log_line = json.dumps({
@@ -100,6 +155,23 @@ class TestLogParser:
         entry = self.parser._parse_log_line(log_line)
         assert entry is None
 
+    def test_parse_log_line_empty_peers(self):
+        """Test parsing a log line whose pools have no peers."""
+        log_line = json.dumps({
+            "timestamp": 1446249499322,
+            "stream": {
+                "upstreams": {
+                    "empty_pool": {"peers": []},
+                    "other_pool": {"peers": [{"server": "test:8080", "connect_time": 3}]}
+                }
+            }
+        })
+
+        entry = self.parser._parse_log_line(log_line)
+
+        assert entry is not None
+        assert [metric.pool_name for metric in entry.upstream_metrics] == ["other_pool"]
+
     def test_parse_log_line_partial_timing_data(self):
         """Test parsing with partial timing data (some metrics missing)."""
         log_line = json.dumps({
@@ -142,19 +214,78 @@ class TestLogParser:
         assert metric2.first_byte_time == 5
         assert metric2.response_time == 10
 
+    def test_parse_log_line_shares_repeated_names(self):
+        """Test that pool and server names are shared across parsed lines."""
+        log_line = json.dumps(_entry(server="10.0.0.1:8080", connect_time=1))
+
+        metric1 = self.parser._parse_log_line(log_line).upstream_metrics[0]
+        metric2 = self.parser._parse_log_line(log_line).upstream_metrics[0]
+
+        assert metric1.pool_name is metric2.pool_name
+        assert metric1.server is metric2.server
+
+    def test_server_name_cache_is_bounded(self, monkeypatch):
+        """Test that server names beyond the cache limit are still parsed."""
+        monkeypatch.setattr(log_parser, "SERVER_NAME_CACHE_SIZE", 2)
+
+        servers = []
+        for i in range(4):
+            log_line = json.dumps(_entry(server=f"10.0.0.{i}:8080", connect_time=1))
+            servers.append(self.parser._parse_log_line(log_line).upstream_metrics[0].server)
+
+        assert servers == [f"10.0.0.{i}:8080" for i in range(4)]
+        assert len(self.parser._server_names) == 2
+
+    @pytest.mark.usefixtures("json_backend")
     def test_parse_log_line_invalid_json(self):
         """Test parsing invalid JSON."""
         with pytest.raises(json.JSONDecodeError):
             self.parser._parse_log_line("invalid json {")
 
+    @pytest.mark.parametrize(
+        "log_line",
+        [
+            "[1, 2, 3]",
+            "42",
+            json.dumps({"timestamp": 1446249499322, "stream": None}),
+            json.dumps({"timestamp": 1446249499322, "stream": ["upstreams"]}),
+            json.dumps({"timestamp": 1446249499322, "stream": {"upstreams": None}}),
+            json.dumps({"timestamp": 1446249499322, "stream": {"upstreams": ["not", "a", "mapping"]}}),
+        ],
+    )
+    @pytest.mark.usefixtures("json_backend")
+    def test_parse_log_line_malformed_structure(self, log_line):
+        """Test that valid JSON with a malformed structure is an error, not skipped."""
+        with pytest.raises(TypeError):
+            self.parser._parse_log_line(log_line)
+
     def test_extract_timing_metric_valid_values(self):
         """Test extracting valid timing metrics."""
         peer_data = {"connect_time": 10, "first_byte_time": 20.5}
 
         assert self.parser._extract_timing_metric(peer_data, "connect_time") == 10
-        assert self.parser._extract_timing_metric(peer_data, "first_byte_time") == 20
+        assert self.parser._extract_timing_metric(peer_data, "first_byte_time") == 21
         assert self.parser._extract_timing_metric(peer_data, "missing_metric") is None
 
+    @pytest.mark.parametrize("metric_name", ["connect_time", "first_byte_time", "response_time"])
+    @pytest.mark.parametrize(
+        "raw_value,expected",
+        [(2.7, 3), (1.4, 1), (0.6, 1), (0.4, 0), (0.5, 1), (2.5, 3), (20.5, 21), (0.0, 0)],
+    )
+    def test_extract_timing_metric_rounds_decimal_values(self, metric_name, raw_value, expected):
+        """Test that fractional milliseconds are rounded half up, not truncated."""
+        peer_data = {metric_name: raw_value}
+
+        assert self.parser._extract_timing_metric(peer_data, metric_name) == expected
+
+    @pytest.mark.parametrize(
+        "raw_value,expected",
+        [(0.49999999999999994, 0), (4503599627370497.0, 4503599627370497), (1e20, 10**20)],
+    )
+    def test_round_half_up_ms_is_exact(self, raw_value, expected):
+        """Test half-up rounding where adding 0.5 would itself round."""
+        assert log_parser._round_half_up_ms(raw_value) == expected
+
     def test_extract_timing_metric_negative_values(self):
         """Test extracting negative timing values (should be filtered out)."""
         peer_data = {"connect_time": -5, "first_byte_time": 0}
@@ -162,46 +293,25 @@ class TestLogParser:
         assert self.parser._extract_timing_metric(peer_data, "connect_time") is None
         assert self.parser._extract_timing_metric(peer_data, "first_byte_time") == 0
 
-    def test_extract_timing_metric_invalid_types(self):
-        """Test extracting timing metrics with invalid data types."""
-        peer_data = {
-            "string_value": "10ms",
-            "list_value": [1, 2, 3],
-            "dict_value": {"time": 5}
-        }
-
-        assert self.parser._extract_timing_metric(peer_data, "string_value") is None
-        assert self.parser._extract_timing_metric(peer_data, "list_value") is None
-        assert self.parser._extract_timing_metric(peer_data, "dict_value") is None
+    @pytest.mark.parametrize(
+        "raw_value", ["10ms", [1, 2, 3], {"time": 5}, -0.4, True, False],
+        ids=["string", "list", "dict", "negative_float", "true", "false"],
+    )
+    def test_extract_timing_metric_invalid_values(self, raw_value):
+        """Test that non-numeric, negative and boolean values are rejected."""
+        assert self.parser._extract_timing_metric({"connect_time": raw_value}, "connect_time") is None
 
+    @pytest.mark.usefixtures("json_backend")
     def test_parse_log_file_success(self, tmp_path):
         """Test parsing a log file successfully."""
         # Create test log file
         log_data = [
-            json.dumps({
-                "timestamp": 1446249499322,
-                "stream": {
-                    "upstreams": {
-                        "test_pool": {
-                            "peers": [{"server": "test:8080", "connect_time": 1}]
-                        }
-                    }
-                }
-            }),
-            json.dumps({
-                "timestamp": 1446249500000,
-                "stream": {
-                    "upstreams": {
-                        "test_pool": {
-                            "peers": [{"server": "test:8080", "response_time": 5}]
-                        }
-                    }
-                }
-            })
+            json.dumps(_entry(server="test:8080", connect_time=1)),
+            json.dumps(_entry(1446249500000, server="test:8080", response_time=5))
         ]
 
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         entries = list(self.parser.parse_log_file(str(log_file)))
 
@@ -214,31 +324,138 @@ class TestLogParser:
         assert stats["skipped_entries"] == 0
         assert stats["error_entries"] == 0
 
+    def test_parse_log_file_line_endings(self, tmp_path):
+        """Test CRLF line endings, blank lines and a trailing newline."""
+        log_data = [
+            json.dumps(_entry(1446249499322 + i, server="test:8080", connect_time=i))
+            for i in range(3)
+        ]
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes(("\r\n".join(log_data) + "\r\n\r\n").encode())
+
+        entries = list(self.parser.parse_log_file(str(log_file)))
+
+        assert [entry.timestamp for entry in entries] == [
+            1446249499322 + i for i in range(3)
+        ]
+        stats = self.parser.get_parsing_stats()
+        assert stats["error_entries"] == 0
+        assert stats["skipped_entries"] == 0
+
+    def test_parse_log_file_empty(self, tmp_path):
+        """Test parsing an empty log file."""
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes(b"")
+
+        assert list(self.parser.parse_log_file(str(log_file))) == []
+        assert self.parser.get_parsing_stats()["total_processed"] == 0
+
+    def test_parse_log_file_truncated_while_parsing(self, tmp_path):
+        """Test that a log truncated mid-parse (copytruncate) just ends early."""
+        log_data = [
+            json.dumps(_entry(1446249499322 + i, server="test:8080", connect_time=i))
+            for i in range(2000)
+        ]
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes("\n".join(log_data).encode())
+
+        entries = self.parser.parse_log_file(str(log_file))
+        next(entries)
+        os.truncate(log_file, 0)
+
+        remaining = list(entries)
+
+        assert len(remaining) < len(log_data) - 1
+        assert self.parser.get_parsing_stats()["parsed_entries"] == len(remaining) + 1
+
+    def test_parse_log_file_stats_after_early_close(self, tmp_path):
+        """Test that stats are recorded when iteration stops early."""
+        log_data = [
+            json.dumps(_entry(1446249499322 + i, server="test:8080", connect_time=i))
+            for i in range(3)
+        ]
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes(("invalid json\n" + "\n".join(log_data) + "\n").encode())
+
+        entries = self.parser.parse_log_file(str(log_file))
+        next(entries)
+        entries.close()
+
+        stats = self.parser.get_parsing_stats()
+        assert stats["parsed_entries"] == 1
+        assert stats["error_entries"] == 1
+
+    def test_parse_log_file_parallel_matches_sequential(self, tmp_path, monkeypatch):
+        """Test that parallel parsing returns the same entries and stats."""
+        monkeypatch.setattr(log_parser, "PARALLEL_MIN_RANGE_SIZE", 64)
+
+        log_data = []
+        for i in range(20):
+            log_data.append(json.dumps(_entry(1446249499322 + i, server="test:8080", connect_time=i)))
+            if i % 5 == 0:
+                log_data.append("invalid json line")
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes("\n".join(log_data).encode())
+
+        sequential_parser = LogParser()
+        expected = list(sequential_parser.parse_log_file(str(log_file)))
+
+        entries = self.parser.parse_log_file_parallel(str(log_file), workers=4)
+
+        assert entries == expected
+        assert self.parser.get_parsing_stats() == sequential_parser.get_parsing_stats()
+
+    def test_parse_byte_range_splits_file(self, tmp_path, monkeypatch):
+        """Test that parsing each byte range in turn parses the whole file."""
+        monkeypatch.setattr(log_parser, "PARALLEL_MIN_RANGE_SIZE", 64)
+
+        log_data = [
+            json.dumps(_entry(1446249499322 + i, server="test:8080", connect_time=i))
+            for i in range(10)
+        ]
+
+        log_file = tmp_path / "test.log"
+        log_file.write_bytes("\n".join(log_data).encode())
+
+        ranges = self.parser._split_byte_ranges(str(log_file), 3)
+        entries = [
+            entry
+            for start, end in ranges
+            for entry in self.parser.parse_byte_range(str(log_file), start, end)
+        ]
+
+        assert len(ranges) == 3
+        assert entries == list(LogParser().parse_log_file(str(log_file)))
+        assert self.parser.get_parsing_stats()["parsed_entries"] == 10
+
+    def test_parse_log_file_parallel_not_found(self):
+        """Test parallel parsing of a non-existent log file."""
+        with pytest.raises(FileNotFoundError):
+            self.parser.parse_log_file_parallel("/non/existent/file.log", workers=2)
+
     def test_parse_log_file_not_found(self):
         """Test parsing a non-existent log file."""
         with pytest.raises(FileNotFoundError):
             list(self.parser.parse_log_file("/non/existent/file.log"))
 
+    @pytest.mark.usefixtures("json_backend")
     def test_parse_log_file_with_errors(self, tmp_path):
         """Test parsing a log file with some invalid lines."""
         log_data = [
-            json.dumps({
-                "timestamp": 1446249499322,
-                "stream": {
-                    "upstreams": {
-                        "test_pool": {
-                            "peers": [{"server": "test:8080", "connect_time": 1}]
-                        }
-                    }
-                }
-            }),
+            json.dumps(_entry(server="test:8080", connect_time=1)),
             "invalid json line",
             "",  # empty line
-            json.dumps({"timestamp": "invalid", "stream": {}})  # invalid timestamp
+            json.dumps({"timestamp": "invalid", "stream": {}}),  # invalid timestamp
+            json.dumps({"timestamp": 1446249499322, "stream": None}),  # malformed stream
+            "[1, 2, 3]",  # not an object
         ]
 
         log_file = tmp_path / "test.log"
-        log_file.write_text("\n".join(log_data))
+        log_file.write_bytes("\n".join(log_data).encode())
 
         entries = list(self.parser.parse_log_file(str(log_file)))
 
@@ -247,7 +464,7 @@ class TestLogParser:
         stats = self.parser.get_parsing_stats()
         assert stats["parsed_entries"] == 1
         assert stats["skipped_entries"] == 1  # invalid timestamp entry
-        assert stats["error_entries"] == 1  # invalid json entry
+        assert stats["error_entries"] == 3  # invalid json and malformed entries
 
     def test_parsing_stats_reset(self):
         """Test resetting parsing statistics."""
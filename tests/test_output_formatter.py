@@ -2,14 +2,91 @@
 Tests for the output formatter module.
 """
 
+import csv
+import io
+
 import pytest
 from claude_logiq.output_formatter import (
+    CSV_HEADER,
     GroupedFormatter,
     CSVFormatter,
     OutputFormatterFactory,
 )
 from claude_logiq.time_aggregator import AggregatedBucket, TimingStats
 
+# Timing statistics shared by the formatter tests; formatters only read them
+_CONNECT_STATS = TimingStats(
+    min_value=1,
+    max_value=5,
+    avg_value=3.0,
+    p5_value=1.5,
+    p95_value=4.5,
+    count=10,
+    metric_name="connect_time",
+)
+_FIRST_BYTE_STATS = TimingStats(
+    min_value=5,
+    max_value=15,
+    avg_value=10.0,
+    p5_value=6.0,
+    p95_value=14.0,
+    count=8,
+    metric_name="first_byte_time",
+)
+_RESPONSE_STATS = TimingStats(
+    min_value=10,
+    max_value=50,
+    avg_value=30.0,
+    p5_value=15.0,
+    p95_value=45.0,
+    count=20,
+    metric_name="response_time",
+)
+_SINGLE_BUCKET = AggregatedBucket(
+    pool_name="test_pool",
+    bucket_start=1446249300000,
+    bucket_end=1446249600000,
+    connect_time_stats=_CONNECT_STATS,
+)
+
+_MULTI_METRIC_BUCKET = AggregatedBucket(
+    pool_name="test_pool",
+    bucket_start=1446249300000,
+    bucket_end=1446249600000,
+    connect_time_stats=_CONNECT_STATS,
+    response_time_stats=_RESPONSE_STATS,
+)
+_POOL_A_BUCKET = AggregatedBucket(
+    pool_name="pool_a",
+    bucket_start=1446249300000,
+    bucket_end=1446249600000,
+    connect_time_stats=_CONNECT_STATS,
+)
+_POOL_B_BUCKET = AggregatedBucket(
+    pool_name="pool_b",
+    bucket_start=1446249300000,
+    bucket_end=1446249600000,
+    response_time_stats=_RESPONSE_STATS,
+)
+
+
+@pytest.fixture(scope="module")
+def grouped_single_bucket_output(grouped_formatter):
+    """Grouped output for _SINGLE_BUCKET, formatted once per module."""
+    return grouped_formatter.format_results([_SINGLE_BUCKET])
+
+
+@pytest.fixture(scope="module")
+def csv_single_bucket_output(csv_formatter):
+    """CSV output for _SINGLE_BUCKET, formatted once per module."""
+    return csv_formatter.format_results([_SINGLE_BUCKET])
+
+
+@pytest.fixture(scope="module")
+def csv_single_bucket_rows(csv_single_bucket_output):
+    """Data rows of csv_single_bucket_output, parsed once per module."""
+    return list(csv.DictReader(io.StringIO(csv_single_bucket_output)))
+
 
 class TestOutputFormatterFactory:
     """Test cases for OutputFormatterFactory."""
@@ -24,6 +101,13 @@ class TestOutputFormatterFactory:
         formatter = OutputFormatterFactory.create_formatter("csv")
         assert isinstance(formatter, CSVFormatter)
 
+    def test_create_formatter_returns_shared_instance(self):
+        """Test that the factory reuses one formatter per type."""
+        grouped = OutputFormatterFactory.create_formatter("grouped")
+
+        assert OutputFormatterFactory.create_formatter("grouped") is grouped
+        assert OutputFormatterFactory.create_formatter("csv") is not grouped
+
     def test_create_invalid_formatter(self):
         """Test creating formatter with invalid type."""
         with pytest.raises(ValueError, match="Unsupported format type"):
@@ -40,40 +124,18 @@ class TestOutputFormatterFactory:
 class TestGroupedFormatter:
     """Test cases for GroupedFormatter."""
 
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.formatter = GroupedFormatter()
-
-    def test_format_empty_results(self):
+    def test_format_empty_results(self, grouped_formatter):
         """Test formatting empty results."""
-        output = self.formatter.format_results([])
+        output = grouped_formatter.format_results([])
         assert "No upstream timing data found" in output
 
-    def test_format_single_bucket(self):
+    def test_format_single_bucket(self, grouped_single_bucket_output):
         """Test formatting a single bucket."""
-        # Create test data
-        connect_stats = TimingStats(
-            min_value=1,
-            max_value=5,
-            avg_value=3.0,
-            p5_value=1.5,
-            p95_value=4.5,
-            count=10,
-            metric_name="connect_time",
-        )
-
-        bucket = AggregatedBucket(
-            pool_name="test_pool",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=connect_stats,
-        )
-
-        output = self.formatter.format_results([bucket])
+        output = grouped_single_bucket_output
 
         # Check that output contains expected elements
         assert "NGINX Plus Upstream Timing Analysis" in output
-        assert "test_pool" in output
+        assert "Upstream Pool: test_pool" in output
         assert "Connect Time:" in output
         assert "Min: 1ms" in output
         assert "Max: 5ms" in output
@@ -82,187 +144,161 @@ class TestGroupedFormatter:
         assert "P95: 4.50ms" in output
         assert "Count: 10 samples" in output
 
-    def test_format_multiple_buckets_same_pool(self):
+    def test_render_struct_single_bucket(self, grouped_formatter):
+        """Test the structured form of a single bucket."""
+        rendered = grouped_formatter.render_struct([_SINGLE_BUCKET])
+
+        assert rendered == [
+            {
+                "pool": "test_pool",
+                "bucket": (
+                    _SINGLE_BUCKET.bucket_start_iso,
+                    _SINGLE_BUCKET.bucket_end_iso,
+                ),
+                "metrics": {
+                    "connect_time": {
+                        "min": 1,
+                        "max": 5,
+                        "avg": 3.0,
+                        "p5": 1.5,
+                        "p95": 4.5,
+                        "count": 10,
+                    }
+                },
+            }
+        ]
+        assert grouped_formatter.render_struct([]) == []
+
+    def test_format_multiple_buckets_same_pool(self, grouped_formatter):
         """Test formatting multiple buckets from the same pool."""
         # Create test data with two time buckets
         bucket1 = AggregatedBucket(
             pool_name="test_pool",
             bucket_start=1446249300000,
             bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
-            ),
+            connect_time_stats=_CONNECT_STATS,
         )
 
         bucket2 = AggregatedBucket(
             pool_name="test_pool",
             bucket_start=1446249600000,
             bucket_end=1446249900000,
-            response_time_stats=TimingStats(
-                min_value=10,
-                max_value=50,
-                avg_value=30.0,
-                p5_value=15.0,
-                p95_value=45.0,
-                count=20,
-                metric_name="response_time",
-            ),
+            response_time_stats=_RESPONSE_STATS,
         )
 
-        output = self.formatter.format_results([bucket1, bucket2])
+        output = grouped_formatter.format_results([bucket1, bucket2])
 
-        # Check that both buckets are present under the same pool
-        assert "test_pool" in output
-        assert "Connect Time:" in output
-        assert "Response Time:" in output
-        assert output.count("Time Bucket:") == 2  # Two time buckets
+        lines = [line.strip() for line in output.splitlines()]
 
-    def test_format_multiple_pools(self):
+        # Check that both buckets are present under the same pool
+        assert [line for line in lines if line.startswith("Upstream Pool:")] == [
+            "Upstream Pool: test_pool"
+        ]
+        assert sum(1 for line in lines if line.startswith("Time Bucket:")) == 2
+        # Each bucket renders its own metric section
+        assert {"Connect Time:", "Response Time:"} <= set(lines)
+
+    def test_format_multiple_pools(self, grouped_formatter):
         """Test formatting multiple pools."""
-        bucket1 = AggregatedBucket(
-            pool_name="pool_a",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
-            ),
-        )
-
-        bucket2 = AggregatedBucket(
-            pool_name="pool_b",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            response_time_stats=TimingStats(
-                min_value=10,
-                max_value=50,
-                avg_value=30.0,
-                p5_value=15.0,
-                p95_value=45.0,
-                count=20,
-                metric_name="response_time",
-            ),
-        )
-
-        output = self.formatter.format_results([bucket1, bucket2])
+        output = grouped_formatter.format_results([_POOL_A_BUCKET, _POOL_B_BUCKET])
 
         # Check that both pools are present
-        assert "pool_a" in output
-        assert "pool_b" in output
-        assert "Connect Time:" in output
-        assert "Response Time:" in output
-
-    def test_format_all_metric_types(self):
+        assert [
+            line for line in output.splitlines() if line.startswith("Upstream Pool:")
+        ] == ["Upstream Pool: pool_a", "Upstream Pool: pool_b"]
+        # pool_a has connect times and pool_b response times
+        lines = [line.strip() for line in output.splitlines()]
+        assert {"Connect Time:", "Response Time:"} <= set(lines)
+
+    def test_format_all_metric_types(self, grouped_formatter):
         """Test formatting with all three metric types."""
         bucket = AggregatedBucket(
             pool_name="full_pool",
             bucket_start=1446249300000,
             bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
-            ),
-            first_byte_time_stats=TimingStats(
-                min_value=5,
-                max_value=15,
-                avg_value=10.0,
-                p5_value=6.0,
-                p95_value=14.0,
-                count=8,
-                metric_name="first_byte_time",
-            ),
-            response_time_stats=TimingStats(
-                min_value=10,
-                max_value=50,
-                avg_value=30.0,
-                p5_value=15.0,
-                p95_value=45.0,
-                count=12,
-                metric_name="response_time",
-            ),
+            connect_time_stats=_CONNECT_STATS,
+            first_byte_time_stats=_FIRST_BYTE_STATS,
+            response_time_stats=_RESPONSE_STATS,
         )
 
-        output = self.formatter.format_results([bucket])
-
-        # Check that all three metric types are present
-        assert "Connect Time:" in output
-        assert "First Byte Time:" in output
-        assert "Response Time:" in output
+        output = grouped_formatter.format_results([bucket])
+
+        # Check that all three metric types are present, in order
+        section_headers = [
+            line.strip()
+            for line in output.splitlines()
+            if line.startswith("  ") and line.endswith(":")
+        ]
+        assert section_headers == [
+            "Connect Time:",
+            "First Byte Time:",
+            "Response Time:",
+        ]
+
+        lines = output.splitlines()
+        first_byte_start = lines.index("  First Byte Time:") + 1
+        assert lines[first_byte_start : first_byte_start + 6] == [
+            "    Min: 5ms",
+            "    Max: 15ms",
+            "    Avg: 10.00ms",
+            "    P5:  6.00ms",
+            "    P95: 14.00ms",
+            "    Count: 8 samples",
+        ]
 
 
 class TestCSVFormatter:
     """Test cases for CSVFormatter."""
 
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.formatter = CSVFormatter()
-
-    def test_format_empty_results(self):
+    def test_format_empty_results(self, csv_formatter):
         """Test formatting empty results."""
-        output = self.formatter.format_results([])
+        rows = csv_formatter.iter_rows([])
 
-        # Should return header only
-        lines = output.strip().split("\n")
-        assert len(lines) == 1
-        assert "pool_name,bucket_start,bucket_end,metric_type" in lines[0]
+        # Should return header only, the same text format_results gives
+        header = next(rows)
+        assert header == ",".join(CSV_HEADER) + "\n"
+        assert header == csv_formatter.format_results([])
+        with pytest.raises(StopIteration):
+            next(rows)
 
-    def test_format_single_bucket_single_metric(self):
+    def test_format_single_bucket_single_metric(self, csv_single_bucket_rows):
         """Test formatting a single bucket with one metric."""
-        bucket = AggregatedBucket(
-            pool_name="test_pool",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
+        # Should have 1 data row, with every header column filled in
+        assert len(csv_single_bucket_rows) == 1
+        row = csv_single_bucket_rows[0]
+        assert list(row) == CSV_HEADER
+
+        assert row["pool_name"] == "test_pool"
+        assert row["metric_type"] == "connect_time"
+        assert row["min_ms"] == "1"
+        assert row["max_ms"] == "5"
+        assert row["avg_ms"] == "3.0"
+        assert row["count"] == "10"
+
+    @pytest.mark.parametrize(
+        "buckets,expected_rows",
+        [
+            ([_SINGLE_BUCKET], [("test_pool", "connect_time")]),
+            (
+                [_MULTI_METRIC_BUCKET],
+                [("test_pool", "connect_time"), ("test_pool", "response_time")],
             ),
-        )
+            (
+                [_POOL_A_BUCKET, _POOL_B_BUCKET],
+                [("pool_a", "connect_time"), ("pool_b", "response_time")],
+            ),
+        ],
+        ids=["single_metric", "multiple_metrics", "multiple_buckets"],
+    )
+    def test_csv_shape(self, csv_formatter, buckets, expected_rows):
+        """Test that each bucket contributes one row per metric type with data."""
+        output = csv_formatter.format_results(buckets)
+        rows = list(csv.DictReader(io.StringIO(output)))
 
-        output = self.formatter.format_results([bucket])
-        lines = output.strip().split("\n")
-
-        # Should have header + 1 data row
-        assert len(lines) == 2
-
-        # Check header
-        header = lines[0]
-        assert "pool_name" in header
-        assert "metric_type" in header
-        assert "min_ms" in header
-        assert "max_ms" in header
-
-        # Check data row
-        data_row = lines[1]
-        assert "test_pool" in data_row
-        assert "connect_time" in data_row
-        assert "1" in data_row  # min
-        assert "5" in data_row  # max
-        assert "3.0" in data_row  # avg
-        assert "10" in data_row  # count
-
-    def test_format_single_bucket_multiple_metrics(self):
-        """Test formatting a single bucket with multiple metrics."""
+        assert [(row["pool_name"], row["metric_type"]) for row in rows] == expected_rows
+
+    def test_csv_format_values(self, csv_formatter):
+        """Test CSV value formatting and rounding."""
         bucket = AggregatedBucket(
             pool_name="test_pool",
             bucket_start=1446249300000,
@@ -270,120 +306,77 @@ class TestCSVFormatter:
             connect_time_stats=TimingStats(
                 min_value=1,
                 max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
+                avg_value=3.123456,  # Should be rounded
+                p5_value=1.789012,  # Should be rounded
+                p95_value=4.567890,  # Should be rounded
                 count=10,
                 metric_name="connect_time",
             ),
-            response_time_stats=TimingStats(
-                min_value=10,
-                max_value=50,
-                avg_value=30.0,
-                p5_value=15.0,
-                p95_value=45.0,
-                count=12,
-                metric_name="response_time",
-            ),
         )
 
-        output = self.formatter.format_results([bucket])
-        lines = output.strip().split("\n")
+        output = csv_formatter.format_results([bucket])
+        row = next(csv.DictReader(io.StringIO(output)))
 
-        # Should have header + 2 data rows (one per metric)
-        assert len(lines) == 3
+        # Check that values are rounded to 2 decimals
+        assert row["avg_ms"] == "3.12"
+        assert row["p5_ms"] == "1.79"
+        assert row["p95_ms"] == "4.57"
 
-        # Check that both metrics are present
-        csv_content = output
-        assert "connect_time" in csv_content
-        assert "response_time" in csv_content
+    def test_csv_iso_timestamps(self, csv_single_bucket_rows):
+        """Test that CSV includes ISO timestamp format."""
+        row = csv_single_bucket_rows[0]
 
-    def test_format_multiple_buckets(self):
-        """Test formatting multiple buckets."""
-        bucket1 = AggregatedBucket(
-            pool_name="pool_a",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
-            ),
-        )
+        # The exact time depends on the local timezone, but the date is fixed
+        assert row["bucket_start"] == _SINGLE_BUCKET.bucket_start_iso
+        assert row["bucket_end"] == _SINGLE_BUCKET.bucket_end_iso
+        assert row["bucket_start"].startswith("2015-10-")
 
-        bucket2 = AggregatedBucket(
-            pool_name="pool_b",
+    def test_csv_quotes_special_pool_names(self, csv_formatter):
+        """Test that pool names with delimiters or quotes are quoted like csv.writer."""
+        bucket = AggregatedBucket(
+            pool_name='pool,"a"',
             bucket_start=1446249300000,
             bucket_end=1446249600000,
-            response_time_stats=TimingStats(
-                min_value=10,
-                max_value=50,
-                avg_value=30.0,
-                p5_value=15.0,
-                p95_value=45.0,
-                count=12,
-                metric_name="response_time",
-            ),
+            connect_time_stats=_CONNECT_STATS,
         )
 
-        output = self.formatter.format_results([bucket1, bucket2])
-        lines = output.strip().split("\n")
+        output = csv_formatter.format_results([bucket])
+        rows = list(csv.reader(io.StringIO(output)))
 
-        # Should have header + 2 data rows
-        assert len(lines) == 3
+        assert rows[1][0] == 'pool,"a"'
+        assert rows[1][3:] == ["connect_time", "1", "5", "3.0", "1.5", "4.5", "10"]
 
-        # Check that both pools are present
-        csv_content = output
-        assert "pool_a" in csv_content
-        assert "pool_b" in csv_content
+    def test_iter_rows_yields_one_row_per_metric(self, csv_formatter):
+        """Test that iter_rows streams the header and one row per metric."""
+        bucket = _MULTI_METRIC_BUCKET
 
-    def test_csv_format_values(self):
-        """Test CSV value formatting and rounding."""
-        bucket = AggregatedBucket(
-            pool_name="test_pool",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.123456,  # Should be rounded
-                p5_value=1.789012,  # Should be rounded
-                p95_value=4.567890,  # Should be rounded
-                count=10,
-                metric_name="connect_time",
-            ),
-        )
+        rows = list(csv_formatter.iter_rows([bucket, bucket]))
 
-        output = self.formatter.format_results([bucket])
+        assert len(rows) == 5
+        assert all(row.endswith("\r\n") for row in rows)
+        assert [row.split(",")[3] for row in rows[1:]] == [
+            "connect_time",
+            "response_time",
+            "connect_time",
+            "response_time",
+        ]
+        assert "".join(rows) == csv_formatter.format_results([bucket, bucket])
 
-        # Check that values are properly rounded
-        assert "3.12" in output  # avg_value rounded to 2 decimals
-        assert "1.79" in output  # p5_value rounded to 2 decimals
-        assert "4.57" in output  # p95_value rounded to 2 decimals
 
-    def test_csv_iso_timestamps(self):
-        """Test that CSV includes ISO timestamp format."""
-        bucket = AggregatedBucket(
-            pool_name="test_pool",
-            bucket_start=1446249300000,
-            bucket_end=1446249600000,
-            connect_time_stats=TimingStats(
-                min_value=1,
-                max_value=5,
-                avg_value=3.0,
-                p5_value=1.5,
-                p95_value=4.5,
-                count=10,
-                metric_name="connect_time",
-            ),
-        )
+class TestOutputFormatter:
+    """Test cases shared by all output formatters."""
+
+    @pytest.mark.parametrize("formatter_name", ["grouped_formatter", "csv_formatter"])
+    @pytest.mark.parametrize(
+        "buckets", [[], [_SINGLE_BUCKET, _SINGLE_BUCKET]], ids=["empty", "two_buckets"]
+    )
+    def test_format_results_iter_matches_format_results(
+        self, request, formatter_name, buckets
+    ):
+        """Test that the streamed byte chunks join to the formatted string."""
+        formatter = request.getfixturevalue(formatter_name)
 
-        output = self.formatter.format_results([bucket])
+        chunks = list(formatter.format_results_iter(buckets))
 
-        # Check that ISO timestamps are present
-        assert "2015-10-" in output  # Should contain the year and month
-        # The exact format may vary based on timezone, but should contain date
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert b"".join(chunks).decode("utf-8") == formatter.format_results(buckets)
@@ -2,6 +2,9 @@
 Tests for the time aggregator module.
 """
 
+import dataclasses
+import statistics
+
 import pytest
 from claude_logiq.log_parser import LogEntry, UpstreamMetrics
 from claude_logiq.time_aggregator import TimeAggregator, TimingStats, AggregatedBucket
@@ -10,10 +13,6 @@ from claude_logiq.time_aggregator import TimeAggregator, TimingStats, Aggregated
 class TestTimeAggregator:
     """Test cases for TimeAggregator class."""
 
-    def setup_method(self):
-        """Set up test fixtures."""
-        self.aggregator = TimeAggregator(bucket_duration_seconds=300)  # 5 minutes
-
     def test_initialization_valid_duration(self):
         """Test initializing aggregator with valid duration."""
         agg = TimeAggregator(600)  # 10 minutes
@@ -28,24 +27,48 @@ class TestTimeAggregator:
         with pytest.raises(ValueError, match="Bucket duration must be positive"):
             TimeAggregator(-100)
 
-    def test_get_bucket_start(self):
+    def test_get_bucket_start(self, aggregator):
         """Test calculating bucket start timestamps."""
-        # Test with 5-minute buckets (300 seconds = 300000 ms)
-        agg = TimeAggregator(300)
-
-        # Test timestamp alignment
+        # Test timestamp alignment with 5-minute buckets (300 seconds = 300000 ms)
         assert (
-            agg._get_bucket_start(1446249499322) == 1446249300000
+            aggregator._get_bucket_start(1446249499322) == 1446249300000
         )  # Rounded down to 5-min boundary
-        assert agg._get_bucket_start(1446249600000) == 1446249600000  # Already aligned
-        assert agg._get_bucket_start(1446249650000) == 1446249600000  # Same bucket
+        assert (
+            aggregator._get_bucket_start(1446249600000) == 1446249600000
+        )  # Already aligned
+        assert (
+            aggregator._get_bucket_start(1446249650000) == 1446249600000
+        )  # Same bucket
 
-    def test_aggregate_empty_entries(self):
+    def test_aggregate_empty_entries(self, aggregator):
         """Test aggregating empty list of entries."""
-        result = self.aggregator.aggregate_metrics([])
+        result = aggregator.aggregate_metrics([])
         assert result == []
 
-    def test_aggregate_single_entry(self):
+    def test_aggregate_from_generator(self, aggregator):
+        """Test aggregating entries consumed lazily from a generator."""
+        entries = (
+            LogEntry(
+                timestamp=1446249499322 + i,
+                upstream_metrics=[
+                    UpstreamMetrics(
+                        pool_name="test_pool",
+                        server="server1",
+                        timestamp=1446249499322 + i,
+                        connect_time=i,
+                    )
+                ],
+            )
+            for i in range(3)
+        )
+
+        result = aggregator.aggregate_metrics(entries)
+
+        assert len(result) == 1
+        assert result[0].connect_time_stats.count == 3
+        assert result[0].connect_time_stats.max_value == 2
+
+    def test_aggregate_single_entry(self, aggregator):
         """Test aggregating a single log entry."""
         # Create test data
         metrics = [
@@ -60,7 +83,7 @@ class TestTimeAggregator:
         ]
         entry = LogEntry(timestamp=1446249499322, upstream_metrics=metrics)
 
-        result = self.aggregator.aggregate_metrics([entry])
+        result = aggregator.aggregate_metrics([entry])
 
         assert len(result) == 1
         bucket = result[0]
@@ -82,7 +105,7 @@ class TestTimeAggregator:
         assert bucket.response_time_stats.count == 1
         assert bucket.response_time_stats.min_value == 3
 
-    def test_aggregate_multiple_pools(self):
+    def test_aggregate_multiple_pools(self, aggregator):
         """Test aggregating entries from multiple pools."""
         metrics1 = [
             UpstreamMetrics(
@@ -106,7 +129,7 @@ class TestTimeAggregator:
             LogEntry(timestamp=1446249499322, upstream_metrics=metrics2),
         ]
 
-        result = self.aggregator.aggregate_metrics(entries)
+        result = aggregator.aggregate_metrics(entries)
 
         assert len(result) == 2
 
@@ -114,7 +137,7 @@ class TestTimeAggregator:
         assert result[0].pool_name == "pool_a"
         assert result[1].pool_name == "pool_b"
 
-    def test_aggregate_multiple_time_buckets(self):
+    def test_aggregate_multiple_time_buckets(self, aggregator):
         """Test aggregating entries across multiple time buckets."""
         metrics1 = [
             UpstreamMetrics(
@@ -138,13 +161,13 @@ class TestTimeAggregator:
             LogEntry(timestamp=1446249799322, upstream_metrics=metrics2),
         ]
 
-        result = self.aggregator.aggregate_metrics(entries)
+        result = aggregator.aggregate_metrics(entries)
 
         assert len(result) == 2
         assert result[0].bucket_start == 1446249300000
         assert result[1].bucket_start == 1446249600000
 
-    def test_partial_metrics(self):
+    def test_partial_metrics(self, aggregator):
         """Test aggregating entries with partial timing data."""
         metrics = [
             UpstreamMetrics(
@@ -166,7 +189,7 @@ class TestTimeAggregator:
         ]
         entry = LogEntry(timestamp=1446249499322, upstream_metrics=metrics)
 
-        result = self.aggregator.aggregate_metrics([entry])
+        result = aggregator.aggregate_metrics([entry])
 
         assert len(result) == 1
         bucket = result[0]
@@ -190,10 +213,9 @@ class TestTimeAggregator:
 class TestTimingStats:
     """Test cases for TimingStats calculation."""
 
-    def test_calculate_timing_stats_single_value(self):
+    def test_calculate_timing_stats_single_value(self, aggregator):
         """Test calculating statistics for a single value."""
-        agg = TimeAggregator(300)
-        stats = agg._calculate_timing_stats([10], "test_metric")
+        stats = aggregator._calculate_timing_stats([10], "test_metric")
 
         assert stats.min_value == 10
         assert stats.max_value == 10
@@ -203,11 +225,10 @@ class TestTimingStats:
         assert stats.count == 1
         assert stats.metric_name == "test_metric"
 
-    def test_calculate_timing_stats_multiple_values(self):
+    def test_calculate_timing_stats_multiple_values(self, aggregator):
         """Test calculating statistics for multiple values."""
-        agg = TimeAggregator(300)
         values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-        stats = agg._calculate_timing_stats(values, "test_metric")
+        stats = aggregator._calculate_timing_stats(values, "test_metric")
 
         assert stats.min_value == 1
         assert stats.max_value == 10
@@ -220,22 +241,19 @@ class TestTimingStats:
         assert stats.p5_value >= stats.min_value
         assert stats.p95_value <= stats.max_value
 
-    def test_calculate_timing_stats_empty_list(self):
+    def test_calculate_timing_stats_empty_list(self, aggregator):
         """Test calculating statistics for empty list."""
-        agg = TimeAggregator(300)
-
         with pytest.raises(
             ValueError, match="Cannot calculate statistics for empty list"
         ):
-            agg._calculate_timing_stats([], "test_metric")
+            aggregator._calculate_timing_stats([], "test_metric")
 
-    def test_calculate_timing_stats_percentiles(self):
+    def test_calculate_timing_stats_percentiles(self, aggregator):
         """Test percentile calculations with known values."""
-        agg = TimeAggregator(300)
         # Use a dataset where percentiles are predictable
         values = list(range(1, 101))  # 1 to 100
 
-        stats = agg._calculate_timing_stats(values, "test_metric")
+        stats = aggregator._calculate_timing_stats(values, "test_metric")
 
         assert stats.min_value == 1
         assert stats.max_value == 100
@@ -245,6 +263,37 @@ class TestTimingStats:
         assert 5 <= stats.p5_value <= 6
         assert 95 <= stats.p95_value <= 96
 
+    def test_calculate_timing_stats_with_duplicates(self, aggregator):
+        """Test that repeated values give the same stats as the sorted list."""
+        values = [7, 3, 3, 9, 1, 3, 7, 7, 2, 40, 3, 1, 9, 9, 9, 5, 5, 1, 2, 3, 100]
+        sorted_values = sorted(values)
+
+        stats = aggregator._calculate_timing_stats(values, "test_metric")
+
+        assert stats.min_value == 1
+        assert stats.max_value == 100
+        assert stats.avg_value == sum(values) / len(values)
+        assert stats.count == len(values)
+        assert stats.p5_value == sorted_values[int(0.05 * (len(values) - 1))]
+        assert stats.p95_value == sorted_values[int(0.95 * (len(values) - 1))]
+
+    @pytest.mark.parametrize(
+        "values,expected_avg", [([1, 1, 1], 1), ([2, 4], 3), ([1, 2], 1.5)]
+    )
+    def test_calculate_timing_stats_avg_type(self, aggregator, values, expected_avg):
+        """Test that the average keeps the type statistics.mean gives it."""
+        stats = aggregator._calculate_timing_stats(values, "test_metric")
+
+        assert stats.avg_value == expected_avg
+        assert type(stats.avg_value) is type(statistics.mean(values))
+
+    def test_calculate_timing_stats_two_values(self, aggregator):
+        """Test that two samples use the lower and upper value as percentiles."""
+        stats = aggregator._calculate_timing_stats([8, 2], "test_metric")
+
+        assert stats.p5_value == 2.0
+        assert stats.p95_value == 8.0
+
 
 class TestAggregatedBucket:
     """Test cases for AggregatedBucket class."""
@@ -265,6 +314,57 @@ class TestAggregatedBucket:
         assert "2015-10-" in end_iso  # Should contain year and month
         assert start_iso < end_iso  # Start should be before end
 
+    def test_bucket_iso_timestamps_follow_reassigned_bounds(self):
+        """Test that ISO strings reflect the current bounds, not cached ones."""
+        bucket = AggregatedBucket(
+            pool_name="test_pool",
+            bucket_start=1446249300000,
+            bucket_end=1446249600000,
+        )
+        start_iso = bucket.bucket_start_iso
+
+        bucket.bucket_start = 1446249000000
+        bucket.bucket_end = 1446249300000
+
+        assert bucket.bucket_start_iso < start_iso
+        assert bucket.bucket_end_iso == start_iso
+
+    def test_bucket_fields_are_public_data_only(self):
+        """Test that asdict and fields expose only the bucket data."""
+        bucket = AggregatedBucket(
+            pool_name="test_pool",
+            bucket_start=1446249300000,
+            bucket_end=1446249600000,
+        )
+        bucket.bucket_start_iso
+
+        assert [f.name for f in dataclasses.fields(bucket)] == list(
+            dataclasses.asdict(bucket)
+        )
+        assert dataclasses.asdict(bucket) == {
+            "pool_name": "test_pool",
+            "bucket_start": 1446249300000,
+            "bucket_end": 1446249600000,
+            "connect_time_stats": None,
+            "first_byte_time_stats": None,
+            "response_time_stats": None,
+        }
+
+    def test_adjacent_buckets_share_iso_strings(self):
+        """Test that a shared bucket bound is formatted once."""
+        first = AggregatedBucket(
+            pool_name="pool_a",
+            bucket_start=1446249300000,
+            bucket_end=1446249600000,
+        )
+        second = AggregatedBucket(
+            pool_name="pool_b",
+            bucket_start=1446249600000,
+            bucket_end=1446249900000,
+        )
+
+        assert second.bucket_start_iso is first.bucket_end_iso
+
     def test_bucket_with_stats(self):
         """Test bucket with timing statistics."""
         connect_stats = TimingStats(
@@ -288,3 +388,5 @@ class TestAggregatedBucket:
         assert bucket.connect_time_stats.count == 10
         assert bucket.first_byte_time_stats is None
         assert bucket.response_time_stats is None
+        assert not hasattr(bucket, "__dict__")
+        assert not hasattr(connect_stats, "__dict__")